@@ -0,0 +1,167 @@
+"""
+ASGI middleware for the streamable HTTP transport, and MCP-level middleware
+for the FastMCP server.
+"""
+
+import zlib
+
+from fastmcp.server.middleware import Middleware
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        # wbits=31 selects the gzip container format
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = (
+            zstandard.COMPRESSOBJ_FLUSH_FINISH
+            if final
+            else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class CompressionMiddleware:
+    """Compress HTTP responses with zstd or gzip, negotiated via Accept-Encoding.
+
+    Large tool results such as ``dump_hierarchy`` XML shrink considerably on
+    the wire. zstd is preferred when the client accepts it and the optional
+    ``zstandard`` package is installed, otherwise gzip is used. Streaming
+    responses (server-sent events) are flushed after every chunk so events
+    are never held back waiting for more data.
+
+    Args:
+        app: The ASGI application to wrap
+        minimum_size: Responses smaller than this many bytes are sent as-is
+        zstd_level: zstd compression level
+        gzip_level: gzip compression level
+    """
+
+    def __init__(
+        self, app, minimum_size: int = 1024, zstd_level: int = 3, gzip_level: int = 6
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.zstd_level = zstd_level
+        self.gzip_level = gzip_level
+
+    def _select_encoding(self, scope) -> str | None:
+        accepted = set()
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accepted.update(
+                    part.split(b";")[0].strip() for part in value.lower().split(b",")
+                )
+        if b"zstd" in accepted and zstandard is not None:
+            return "zstd"
+        if b"gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _stream(self, encoding: str):
+        if encoding == "zstd":
+            return _ZstdStream(self.zstd_level)
+        return _GzipStream(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._select_encoding(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        stream = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, stream, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if b"content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                stream = self._stream(encoding)
+                headers = [
+                    (name, value)
+                    for name, value in start_message.get("headers", [])
+                    if name != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                compressed = stream.compress(body, final=not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start_message, "headers": headers})
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": compressed,
+                        "more_body": more_body,
+                    }
+                )
+                return
+
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": stream.compress(body, final=not more_body),
+                    "more_body": more_body,
+                }
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class ToolListCache(Middleware):
+    """Serve ``tools/list`` from a cache built once per process.
+
+    The tool surface is fixed once ``register_all_tools`` has run, so there is
+    no reason to walk the tool manager and re-filter every tool on each
+    request. The server lifespan primes the cache at startup so the first
+    client does not pay for it either.
+    """
+
+    def __init__(self):
+        self._tools = None
+
+    async def on_list_tools(self, context, call_next):
+        if self._tools is None:
+            self._tools = await call_next(context)
+        return self._tools
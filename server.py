@@ -1,12 +1,41 @@
-from fastmcp import FastMCP
+import asyncio
+import atexit
+import contextlib
+import importlib.util
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+import orjson
+import uvicorn
+from fastmcp import Client, FastMCP
+from fastmcp.tools.tool import default_serializer
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from middleware import CompressionMiddleware, ToolListCache
 
 # Import the tools package
 from tools import register_all_tools
+from tools._device import close_all
 
-# Create a basic server instance
-mcp = FastMCP(
-    name="Android Device Operator",
-    instructions="""You are an expert Android device automation specialist using uiautomator2.
+log = logging.getLogger(__name__)
+
+
+def _serialize_tool_result(data: Any) -> str:
+    """Serialize tool results with orjson, falling back to FastMCP's serializer for unsupported types."""
+    try:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+    except TypeError:
+        return default_serializer(data)
+
+
+# Sent to clients once per session in the initialize response
+INSTRUCTIONS = """You are an expert Android device automation specialist using uiautomator2.
 
 🚀 **AUTOMATIC DEVICE HANDLING**
 All tools now automatically validate device connections and handle device_id intelligently.
@@ -47,21 +76,174 @@ All tools now automatically validate device connections and handle device_id int
 
 🎯 **RESPONSE FORMAT**
 Always explain what you're doing, show results clearly, and suggest next steps.
-When tools return structured responses, present the information in an organized, readable way.""",
+When tools return structured responses, present the information in an organized, readable way."""
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(server: FastMCP):
+    # Scheduled now, run once the lifespan has been entered: the in-process
+    # client then joins this lifespan instead of starting a nested one
+    prime = asyncio.create_task(_prime_tool_list(server))
+    try:
+        yield
+    finally:
+        prime.cancel()
+        close_all()
+
+
+async def _prime_tool_list(server: FastMCP) -> None:
+    """Build the cached tools/list response before the first client asks for it."""
+    try:
+        async with Client(server) as client:
+            await client.list_tools()
+    except Exception as e:
+        log.warning("Could not prime the tool list: %s", e)
+
+
+# Create a basic server instance
+mcp = FastMCP(
+    name="Android Device Operator",
+    instructions=INSTRUCTIONS,
+    tool_serializer=_serialize_tool_result,
+    lifespan=_lifespan,
 )
+mcp.add_middleware(ToolListCache())
 
 # Register all tools from the modular tool package
 register_all_tools(mcp)
 
-if __name__ == "__main__":
-    # STDIO server launch
-    # mcp.run(
-    #     transport="stdio",
-    #     show_banner=False,
-    # )
-    # STREAMABLE HTTP server launch (uncomment to use)
-    mcp.run(
+
+if importlib.util.find_spec("prometheus_client") is not None:
+
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics(request: Request) -> Response:
+        """Prometheus scrape endpoint (per-tool latency histograms)."""
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# Seconds an in-flight tool call gets to finish once shutdown is requested
+SHUTDOWN_TIMEOUT = 30
+
+
+def _transport() -> str:
+    """Transport from MCP_TRANSPORT: ``http`` (default) or ``stdio``."""
+    return os.getenv("MCP_TRANSPORT", "http").lower()
+
+
+def _bind() -> str:
+    """Listen address from MCP_BIND: ``host:port`` or ``unix:/path/to.sock``."""
+    return os.getenv("MCP_BIND", "0.0.0.0:8080")
+
+
+def _bind_options(bind: str) -> dict:
+    """Translate a bind address into uvicorn host/port or Unix socket options."""
+    if bind.startswith("unix:"):
+        return {"uds": bind[len("unix:") :]}
+    host, _, port = bind.rpartition(":")
+    return {"host": host or "0.0.0.0", "port": int(port)}
+
+
+def _workers() -> int:
+    """Number of HTTP worker processes, from the MCP_WORKERS environment variable."""
+    return max(1, int(os.getenv("MCP_WORKERS", "1")))
+
+
+def create_app():
+    """Build the streamable HTTP ASGI app.
+
+    Also used as the uvicorn factory for each worker process. With more than
+    one worker, sessions cannot be shared between processes, so the app runs
+    in stateless mode where every request is self-contained.
+    """
+    return mcp.http_app(
         transport="streamable-http",
-        host="0.0.0.0",
-        port=8080,
+        middleware=[Middleware(CompressionMiddleware)],
+        stateless_http=_workers() > 1,
     )
+
+
+def _event_loop() -> str:
+    """Prefer uvloop for the HTTP server, falling back where it is unavailable (Windows)."""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def _http_protocol() -> str:
+    """Prefer the httptools parser over the pure-Python h11 one."""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def _configure_logging() -> None:
+    """Log warnings to stderr from a background thread.
+
+    Tool calls run on worker threads and log their failures; handing records
+    to a queue keeps them from contending for the stderr lock and blocking
+    on a slow pipe. stdout carries the protocol under the stdio transport,
+    so diagnostics (tool failures, reconnects) always go to stderr.
+    """
+    records = queue.SimpleQueue()
+    # QueueHandler formats each record before queueing it, so the stderr
+    # handler only writes the finished line.
+    listener = QueueListener(records, logging.StreamHandler(sys.stderr))
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        handlers=[QueueHandler(records)],
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def _serve_http2(app, bind: str, certfile: str, keyfile: str) -> None:
+    """Serve the ASGI app over TLS with HTTP/2 stream multiplexing via Hypercorn.
+
+    HTTP/2 lets an agent issue independent tool calls (e.g. ``dump_hierarchy``
+    and ``screenshot``) as concurrent streams on one connection instead of
+    queueing them behind each other. Requires the optional ``http2`` extra.
+    """
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [bind]
+    config.certfile = certfile
+    config.keyfile = keyfile
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.h2_max_concurrent_streams = 100
+    config.keep_alive_timeout = 120
+    config.graceful_timeout = SHUTDOWN_TIMEOUT
+    asyncio.run(serve(app, config))
+
+
+if __name__ == "__main__":
+    _configure_logging()
+    if _transport() == "stdio":
+        mcp.run(transport="stdio", show_banner=False)
+    elif os.getenv("MCP_TLS_CERTFILE") and os.getenv("MCP_TLS_KEYFILE"):
+        _serve_http2(
+            create_app(),
+            _bind(),
+            os.environ["MCP_TLS_CERTFILE"],
+            os.environ["MCP_TLS_KEYFILE"],
+        )
+    else:
+        workers = _workers()
+        uvicorn.run(
+            # Worker processes must import the app themselves
+            "server:create_app" if workers > 1 else create_app(),
+            factory=workers > 1,
+            **_bind_options(_bind()),
+            loop=_event_loop(),
+            http=_http_protocol(),
+            log_level="warning",
+            access_log=False,
+            workers=workers,
+            # Keep agent connections open between tool calls instead of paying
+            # a new TCP handshake per request.
+            timeout_keep_alive=120,
+            limit_concurrency=1024,
+            # On SIGTERM/SIGINT stop accepting connections and give in-flight
+            # device calls time to finish before exiting.
+            timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+        )
@@ -179,3 +179,83 @@ def test_tools_modules_syntax():
             pytest.fail(f"{module_path} not found")
         except Exception as e:
             pytest.fail(f"Unexpected error checking {module_path}: {e}")
+
+
+def test_compression_middleware_negotiates_encoding():
+    """Test that large responses are compressed and small ones left alone."""
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    from middleware import CompressionMiddleware
+
+    app = Starlette(
+        routes=[
+            Route("/big", lambda request: PlainTextResponse("x" * 4096)),
+            Route("/small", lambda request: PlainTextResponse("ok")),
+        ],
+        middleware=[Middleware(CompressionMiddleware)],
+    )
+    client = TestClient(app)
+
+    response = client.get("/big", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "x" * 4096
+
+    response = client.get("/small", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "ok"
+
+
+def test_tool_list_cache_calls_through_once():
+    """Test that the tool list cache only builds the list on the first request."""
+    import asyncio
+
+    from middleware import ToolListCache
+
+    calls = []
+
+    async def call_next(context):
+        calls.append(context)
+        return ["tool"]
+
+    cache = ToolListCache()
+    first = asyncio.run(cache.on_list_tools("ctx", call_next))
+    second = asyncio.run(cache.on_list_tools("ctx", call_next))
+
+    assert first == second == ["tool"]
+    assert len(calls) == 1
+
+
+def test_lifespan_primes_tool_list_cache():
+    """Test that the tool list is built at startup, before any client asks."""
+    import time
+
+    from starlette.testclient import TestClient
+
+    import server
+    from middleware import ToolListCache
+
+    (cache,) = [m for m in server.mcp.middleware if isinstance(m, ToolListCache)]
+    cache._tools = None
+    with TestClient(server.mcp.http_app()):
+        deadline = time.monotonic() + 5
+        while cache._tools is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert {tool.name for tool in cache._tools} >= {"mcp_health", "click"}
+
+
+def test_metrics_endpoint_reports_tool_latency():
+    """Test that /metrics exposes the per-tool latency histogram."""
+    pytest.importorskip("prometheus_client")
+    from starlette.testclient import TestClient
+
+    import server
+
+    with TestClient(server.mcp.http_app()) as client:
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "mcp_tool_seconds" in response.text
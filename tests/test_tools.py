@@ -0,0 +1,985 @@
+import asyncio
+import base64
+import inspect
+import io
+import threading
+from unittest.mock import MagicMock, PropertyMock
+
+import pytest
+from uiautomator2.exceptions import UiObjectNotFoundError
+
+from tools import _adb, _device, _registry, _selectors
+from tools._registry import ToolRegistrar, offload
+
+
+def test_offload_runs_blocking_tool_in_worker_thread():
+    """Test that blocking tools are executed off the event loop thread."""
+
+    def blocking_tool(value: int, device_id=None) -> int:
+        """Return the worker thread id alongside the value."""
+        return value, threading.get_ident()
+
+    wrapped = offload(blocking_tool)
+    assert inspect.iscoroutinefunction(wrapped)
+    assert wrapped.__doc__ == blocking_tool.__doc__
+    assert list(inspect.signature(wrapped).parameters) == ["value", "device_id"]
+
+    value, thread_id = asyncio.run(wrapped(value=3, device_id="emulator-5554"))
+    assert value == 3
+    assert thread_id != threading.get_ident()
+
+
+def test_offload_leaves_async_tools_unchanged():
+    """Test that coroutine tools are registered as-is."""
+
+    async def async_tool():
+        return True
+
+    assert offload(async_tool) is async_tool
+
+
+def test_importing_tools_defers_uiautomator2():
+    """Test that registering the tools does not import uiautomator2 or adbutils."""
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, tools; "
+        "print(sorted({'uiautomator2', 'adbutils'} & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_get_device_reuses_connection(monkeypatch):
+    """Test that devices are connected once and then served from the pool."""
+    connects = []
+
+    def fake_connect(device_id):
+        connects.append(device_id)
+        return MagicMock(serial=device_id)
+
+    monkeypatch.setattr(_device.u2, "connect", fake_connect)
+    monkeypatch.setattr(_device, "_devices", {})
+    monkeypatch.setattr(_device, "_start_keepalive", lambda: None)
+
+    first = _device.get_device("emulator-5554")
+    assert _device.get_device("emulator-5554") is first
+    assert _device.get_device("other") is not first
+    assert connects == ["emulator-5554", "other"]
+
+
+def test_get_device_aliases_default_device_by_serial(monkeypatch):
+    """Test that the default device and its serial share one connection."""
+    connects = []
+
+    def fake_connect(device_id):
+        connects.append(device_id)
+        return MagicMock(serial="emulator-5554")
+
+    monkeypatch.setattr(_device.u2, "connect", fake_connect)
+    monkeypatch.setattr(_device, "_devices", {})
+    monkeypatch.setattr(_device, "_start_keepalive", lambda: None)
+
+    d = _device.get_device()
+    assert _device.get_device("emulator-5554") is d
+    assert connects == [None]
+
+    assert _device.clear_devices("emulator-5554") == 1
+    assert _device._devices == {}
+
+
+def test_new_connections_use_fast_mode(monkeypatch):
+    """Test that connections get the fast configurator until it is switched off."""
+    d = MagicMock(serial="emulator-5554")
+    monkeypatch.setattr(_device.u2, "connect", lambda device_id: d)
+    monkeypatch.setattr(_device, "_devices", {})
+    monkeypatch.setattr(_device, "_fast_mode", True)
+    monkeypatch.setattr(_device, "_start_keepalive", lambda: None)
+
+    _device.get_device()
+    d.jsonrpc.setConfigurator.assert_called_once_with(_device.FAST_CONFIGURATOR)
+
+    assert _device.set_fast_mode(False) == 1
+    d.jsonrpc.setConfigurator.assert_called_with(_device.DEFAULT_CONFIGURATOR)
+
+
+def test_with_device_reconnects_once_on_connection_error(monkeypatch):
+    """Test that a stale connection is dropped and the action retried once."""
+    stale, fresh = MagicMock(serial="emulator-5554"), MagicMock(serial="emulator-5554")
+    connections = iter([stale, fresh, MagicMock(serial="emulator-5554")])
+
+    monkeypatch.setattr(_device.u2, "connect", lambda device_id: next(connections))
+    monkeypatch.setattr(_device, "_devices", {})
+    monkeypatch.setattr(_device, "_start_keepalive", lambda: None)
+
+    def action(d):
+        if d is stale:
+            raise ConnectionError("device offline")
+        return "ok"
+
+    assert _device.with_device("emulator-5554", action) == "ok"
+    assert _device.get_device("emulator-5554") is fresh
+
+    def fails(d):
+        raise ConnectionError("still offline")
+
+    with pytest.raises(ConnectionError):
+        _device.with_device("emulator-5554", fails)
+
+
+def test_with_device_does_not_replay_mutating_actions(monkeypatch):
+    """Test that an action run with retry=False is not repeated after a drop."""
+    stale, fresh = MagicMock(serial="emulator-5554"), MagicMock(serial="emulator-5554")
+    connections = iter([stale, fresh])
+
+    monkeypatch.setattr(_device.u2, "connect", lambda device_id: next(connections))
+    monkeypatch.setattr(_device, "_devices", {})
+    monkeypatch.setattr(_device, "_start_keepalive", lambda: None)
+
+    calls = []
+
+    def send_text(d):
+        calls.append(d)
+        raise ConnectionError("response lost")
+
+    with pytest.raises(ConnectionError):
+        _device.with_device("emulator-5554", send_text, retry=False)
+    assert calls == [stale]
+    assert _device.get_device("emulator-5554") is fresh
+
+
+def test_compact_hierarchy_interns_classes_and_flattens_bounds():
+    """Test the compact column-oriented hierarchy format."""
+    from tools.inspection_tools import _compact_hierarchy
+
+    xml = (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>"
+        '<hierarchy rotation="0">'
+        '<node class="android.widget.FrameLayout" bounds="[0,0][1080,2280]">'
+        '<node class="android.widget.Button" text="OK" resource-id="app:id/ok"'
+        ' clickable="true" bounds="[10,20][110,80]" />'
+        '<node class="android.widget.Button" text="Cancel" bounds="[120,20][220,80]" />'
+        "</node>"
+        "</hierarchy>"
+    )
+    compact = _compact_hierarchy(xml)
+
+    assert compact["classes"] == ["android.widget.FrameLayout", "android.widget.Button"]
+    assert compact["class_idx"] == [0, 1, 1]
+    assert compact["resource_ids"] == ["app:id/ok"]
+    assert compact["resource_id_idx"] == [-1, 0, -1]
+    assert compact["parent"] == [-1, 0, 0]
+    assert compact["text"] == ["", "OK", "Cancel"]
+    assert compact["clickable"] == [False, True, False]
+    assert compact["bounds"] == [0, 0, 1080, 2280, 10, 20, 110, 80, 120, 20, 220, 80]
+
+
+def test_filter_hierarchy_keeps_matching_subtrees():
+    """Test that filter_class and xpath keep only the matching subtrees."""
+    from tools.inspection_tools import _filter_hierarchy, _xpath_hierarchy
+
+    xml = (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>"
+        '<hierarchy rotation="0">'
+        '<node class="android.widget.FrameLayout">'
+        '<node class="android.widget.LinearLayout" text="a">'
+        '<node class="android.widget.TextView" text="b"/>'
+        "</node>"
+        '<node class="android.widget.Button" text="OK"/>'
+        '<node class="android.widget.LinearLayout" text="c"/>'
+        "</node>"
+        "</hierarchy>"
+    )
+
+    assert _filter_hierarchy(xml, "android.widget.LinearLayout", False) == (
+        '<hierarchy rotation="0">'
+        '<node class="android.widget.LinearLayout" text="a">'
+        '<node class="android.widget.TextView" text="b"/>'
+        "</node>"
+        '<node class="android.widget.LinearLayout" text="c"/>'
+        "</hierarchy>"
+    )
+    assert _filter_hierarchy(xml, "missing", False) == '<hierarchy rotation="0"/>'
+
+    assert _xpath_hierarchy(xml, "//node[@text='b' or @text='OK']", False) == (
+        '<hierarchy rotation="0">'
+        '<node class="android.widget.TextView" text="b"/>'
+        '<node class="android.widget.Button" text="OK"/>'
+        "</hierarchy>"
+    )
+
+
+def test_find_xpaths_queries_one_parse():
+    """Test that several XPath expressions are answered from one dump."""
+    from tools.inspection_tools import _find_xpaths
+
+    xml = (
+        '<hierarchy rotation="0">'
+        '<node class="android.widget.Button" text="OK" clickable="true"/>'
+        '<node class="android.widget.TextView" text="Title" clickable="false"/>'
+        "</hierarchy>"
+    )
+    assert _find_xpaths(xml, ["//node[@clickable='true']", "//node[@text='x']"]) == {
+        "//node[@clickable='true']": [
+            {"class": "android.widget.Button", "text": "OK", "clickable": "true"}
+        ],
+        "//node[@text='x']": [],
+    }
+
+
+def test_eased_swipe_points_accelerate_and_decelerate():
+    """Test that cubic swipe points start and end slowly and keep the endpoints."""
+    from tools.input_tools import _eased_points
+
+    points = _eased_points(100, 1000, 100, 200, 0.5)
+    assert len(points) == 30
+    assert points[0] == (100, 1000) and points[-1] == (100, 200)
+    steps = [a[1] - b[1] for a, b in zip(points, points[1:])]
+    assert steps[0] < steps[len(steps) // 2] > steps[-1]
+
+    assert _eased_points(540, 2160, 540, 240, 0.01)[1] == (540, 1200)
+
+
+def test_cubic_swipe_converts_fractions_per_coordinate(monkeypatch):
+    """Test that a cubic swipe reads fractions per coordinate, like d.swipe."""
+    from tools import input_tools
+
+    registered = {}
+    mcp = MagicMock()
+    mcp.tool = lambda **kwargs: lambda fn: registered.setdefault(kwargs["name"], fn)
+    input_tools.register_input_tools(mcp)
+
+    d = MagicMock()
+    d.pos_rel2abs = lambda x, y: (
+        int(1080 * x) if x < 1 else x,
+        int(2400 * y) if y < 1 else y,
+    )
+    monkeypatch.setattr(_device, "get_device", lambda device_id=None: d)
+
+    assert registered["swipe"](0.5, 1800, 0.5, 600, easing="cubic") is True
+    points = d.swipe_points.call_args[0][0]
+    assert points[0] == (540, 1800) and points[-1] == (540, 600)
+
+
+def test_ui_snapshot_uses_one_batch(monkeypatch, tmp_path):
+    """Test that a UI snapshot is read with a single JSON-RPC batch."""
+    from tools import inspection_tools
+
+    batches = []
+
+    def fake_batch(d, calls):
+        batches.append([c["method"] for c in calls])
+        return [
+            {"id": 0, "result": "<hierarchy/>"},
+            {"id": 1, "error": {"message": "UiObjectNotFoundException"}},
+            {"id": 2, "result": base64.b64encode(b"jpeg-data").decode()},
+        ]
+
+    monkeypatch.setattr(inspection_tools, "jsonrpc_batch", fake_batch)
+    shot = str(tmp_path / "shot.jpg")
+
+    snapshot = inspection_tools._ui_snapshot(MagicMock(), True, True, shot, True, 50)
+    assert batches == [["dumpWindowHierarchy", "objInfo", "takeScreenshot"]]
+    assert snapshot == {
+        "hierarchy": "<hierarchy/>",
+        "focused": None,
+        "screenshot": shot,
+    }
+    assert (tmp_path / "shot.jpg").read_bytes() == b"jpeg-data"
+
+
+def test_element_info_includes_tap_point():
+    """Test that element properties carry the center for click_at."""
+    from tools.inspection_tools import ElementInfo
+
+    bounds = {"left": 0, "top": 100, "right": 201, "bottom": 150}
+    properties = ElementInfo.from_info({"text": "OK", "bounds": bounds}).to_dict()
+    assert (properties["cx"], properties["cy"]) == (100, 125)
+    assert ElementInfo.from_info({}).to_dict()["cx"] is None
+
+
+def test_batch_action_dispatch(monkeypatch):
+    """Test that batch actions resolve registered tools and capture errors."""
+    from tools import batch_tools
+
+    calls = []
+
+    async def fake_click(selector: str, device_id=None) -> bool:
+        calls.append((selector, device_id))
+        return True
+
+    monkeypatch.setitem(batch_tools.TOOLS, "fake_click", fake_click)
+
+    ok = asyncio.run(
+        batch_tools._run_action(
+            {"tool": "fake_click", "args": {"selector": "OK"}}, "abc"
+        )
+    )
+    assert ok == {"tool": "fake_click", "ok": True, "result": True}
+    assert calls == [("OK", "abc")]
+
+    missing = asyncio.run(batch_tools._run_action({"tool": "missing"}, None))
+    assert missing["ok"] is False
+
+    # Arguments are validated like a direct tool call before dispatch
+    for args in ({"selector": ["OK"]}, {"selector": "OK", "selectr": "OK"}):
+        invalid = asyncio.run(
+            batch_tools._run_action({"tool": "fake_click", "args": args}, None)
+        )
+        assert invalid["ok"] is False
+        assert invalid["error"].startswith("ValidationError")
+    assert calls == [("OK", "abc")]
+
+
+def test_chain_stops_at_error_and_observes(monkeypatch):
+    """Test that chain stops at the first failed action and reports the current app."""
+    from tools import batch_tools
+
+    registered = {}
+    mcp = MagicMock()
+    mcp.tool = lambda **kwargs: lambda fn: registered.setdefault(kwargs["name"], fn)
+    batch_tools.register_batch_tools(mcp)
+
+    async def fail(device_id=None):
+        raise RuntimeError("boom")
+
+    async def get_current_app(device_id=None):
+        return {"package": "com.example", "device": device_id}
+
+    monkeypatch.setitem(batch_tools.TOOLS, "fail", fail)
+    monkeypatch.setitem(batch_tools.TOOLS, "get_current_app", get_current_app)
+
+    outcome = asyncio.run(
+        registered["chain"]([{"tool": "fail"}, {"tool": "fail"}], device_id="abc")
+    )
+    assert [r["ok"] for r in outcome["results"]] == [False]
+    assert outcome["current_app"] == {"package": "com.example", "device": "abc"}
+
+    async def not_found(device_id=None):
+        return False
+
+    monkeypatch.setitem(batch_tools.TOOLS, "not_found", not_found)
+    outcome = asyncio.run(
+        registered["chain"]([{"tool": "not_found"}, {"tool": "fail"}], device_id="abc")
+    )
+    assert outcome["results"] == [
+        {
+            "tool": "not_found",
+            "ok": False,
+            "result": False,
+            "error": "Tool returned False",
+        }
+    ]
+
+
+def test_parallel_exec_runs_once_per_device(monkeypatch):
+    """Test that a device listed twice runs the tool only once."""
+    from tools import batch_tools
+
+    registered = {}
+    mcp = MagicMock()
+    mcp.tool = lambda **kwargs: lambda fn: registered.setdefault(kwargs["name"], fn)
+    batch_tools.register_batch_tools(mcp)
+
+    calls = []
+
+    async def press_key(key: str, device_id=None) -> bool:
+        calls.append(device_id)
+        return True
+
+    monkeypatch.setitem(batch_tools.TOOLS, "press_key", press_key)
+    results = asyncio.run(
+        registered["parallel_exec"]("press_key", ["a", "b", "a"], {"key": "home"})
+    )
+    assert sorted(calls) == ["a", "b"]
+    assert list(results) == ["a", "b"]
+
+
+def test_read_only_results_cached_until_mutation(monkeypatch):
+    """Test that read-only tool results are reused until a mutating tool runs."""
+    monkeypatch.setattr(_registry, "TOOLS", {})
+    monkeypatch.setattr(_registry, "_results", {})
+    registrar = ToolRegistrar(MagicMock())
+    calls = []
+
+    def get_current_app(device_id=None):
+        calls.append(device_id)
+        return {"package": "com.example", "success": True}
+
+    def click(selector, device_id=None):
+        return True
+
+    registrar.tool(name="get_current_app")(get_current_app)
+    registrar.tool(name="click")(click)
+
+    async def scenario():
+        read = _registry.TOOLS["get_current_app"]
+        await read(device_id="emulator-5554")
+        await read(device_id="emulator-5554")
+        await _registry.TOOLS["click"](selector="OK", device_id="emulator-5554")
+        await read(device_id="emulator-5554")
+
+    asyncio.run(scenario())
+    assert calls == ["emulator-5554", "emulator-5554"]
+
+
+def test_adb_path_is_cached(monkeypatch):
+    """Test that adb is looked up once and re-resolved only after invalidation."""
+    lookups = []
+
+    def fake_which(name):
+        lookups.append(name)
+        return "/usr/bin/adb"
+
+    monkeypatch.setattr(_adb.shutil, "which", fake_which)
+    monkeypatch.setattr(_adb, "_ADB_PATH", None)
+
+    assert _adb.get_adb_path() == "/usr/bin/adb"
+    assert _adb.get_adb_path() == "/usr/bin/adb"
+    assert lookups == ["adb"]
+
+    _adb.invalidate_adb_cache()
+    _adb.get_adb_path()
+    assert lookups == ["adb", "adb"]
+
+
+def test_adb_shell_session_reuses_process(monkeypatch, tmp_path):
+    """Test that the persistent shell runs several commands in one process."""
+    fake_adb = tmp_path / "adb"
+    fake_adb.write_text("#!/bin/sh\nexec sh\n")
+    fake_adb.chmod(0o755)
+    monkeypatch.setattr(_adb, "_ADB_PATH", str(fake_adb))
+
+    shell = _adb.AdbShell("emulator-5554")
+    try:
+        assert shell.run("echo one; echo two") == ("one\ntwo", 0)
+        pid = shell._proc.pid
+        assert shell.run("false") == ("", 1)
+        assert shell.run("printf x", timeout=2) == ("x", 0)
+        assert shell._proc.pid == pid
+    finally:
+        shell.close()
+
+
+def test_adb_devices_output_reused_within_ttl(monkeypatch, tmp_path):
+    """Test that back-to-back adb devices calls spawn adb only once."""
+    runs = tmp_path / "runs"
+    fake_adb = tmp_path / "adb"
+    fake_adb.write_text(
+        f"#!/bin/sh\necho run >> {runs}\nprintf 'List\\nemulator-5554\\tdevice\\n'\n"
+    )
+    fake_adb.chmod(0o755)
+    monkeypatch.setattr(_adb, "_ADB_PATH", str(fake_adb))
+    monkeypatch.setattr(_adb, "_devices_output", None)
+
+    first = asyncio.run(_adb.adb_devices())
+    assert asyncio.run(_adb.adb_devices()) == first
+    assert _adb.parse_adb_devices(first) == ["emulator-5554"]
+    assert runs.read_text().count("run") == 1
+
+
+def test_ready_devices_queries_adb_server(monkeypatch):
+    """Test that ready devices come from the adb server, falling back to adb devices."""
+    from adbutils import AdbDeviceInfo, adb
+
+    infos = [
+        AdbDeviceInfo(serial="emulator-5554", state="device", tags={}),
+        AdbDeviceInfo(serial="R58M", state="unauthorized", tags={}),
+    ]
+    monkeypatch.setattr(adb, "list", lambda: infos)
+    assert asyncio.run(_adb.ready_devices()) == ["emulator-5554"]
+
+    def unreachable():
+        raise ConnectionRefusedError
+
+    async def adb_devices():
+        return b"List of devices attached\n192.168.1.5:5555\tdevice\n"
+
+    monkeypatch.setattr(adb, "list", unreachable)
+    monkeypatch.setattr(_adb, "adb_devices", adb_devices)
+    assert asyncio.run(_adb.ready_devices()) == ["192.168.1.5:5555"]
+
+
+def test_stop_all_command_skips_kept_and_idle_apps(tmp_path):
+    """Test that the stop-all shell loop stops only running, non-kept apps."""
+    import shutil
+    import subprocess
+
+    from tools import app_tools
+
+    stopped = tmp_path / "stopped"
+    scripts = {
+        "pm": "printf 'package:com.a\\npackage:com.b\\npackage:com.idle\\n"
+        "package:com.github.uiautomator\\n'",
+        "pidof": 'test "$1" != com.idle',
+        "am": f'echo "$2" >> {stopped}',
+    }
+    for name, body in scripts.items():
+        script = tmp_path / name
+        script.write_text(f"#!/bin/sh\n{body}\n")
+        script.chmod(0o755)
+
+    command = app_tools._stop_all_command(["com.b"])
+    result = subprocess.run(
+        ["sh", "-c", command], env={"PATH": f"{tmp_path}:/usr/bin:/bin"}
+    )
+    assert result.returncode == 0
+    assert stopped.read_text().split() == ["com.a"]
+
+    # Without pidof every non-kept app is stopped
+    (tmp_path / "pidof").unlink()
+    (tmp_path / "sed").symlink_to(shutil.which("sed"))
+    stopped.unlink()
+    result = subprocess.run(
+        [shutil.which("sh"), "-c", command], env={"PATH": str(tmp_path)}
+    )
+    assert result.returncode == 0
+    assert stopped.read_text().split() == ["com.a", "com.idle"]
+
+
+def test_wait_activity_follows_logcat(monkeypatch, tmp_path):
+    """Test that wait_activity returns on the activity manager's log line."""
+    from tools import advanced_tools
+
+    fake_adb = tmp_path / "adb"
+    fake_adb.write_text(
+        "#!/bin/sh\n"
+        'case "$*" in\n'
+        "*logcat*) echo 'I/ActivityTaskManager(  1): START u0 "
+        "{cmp=com.example/.MainActivity} from uid 1'; exec sleep 5;;\n"
+        "*) exec sh;;\n"
+        "esac\n"
+    )
+    fake_adb.chmod(0o755)
+    monkeypatch.setattr(_adb, "_ADB_PATH", str(fake_adb))
+    monkeypatch.setattr(_adb, "_shells", {})
+    d = MagicMock(serial="emulator-5554")
+    d.wait_activity.return_value = False
+
+    try:
+        assert advanced_tools._wait_activity(d, ".MainActivity", 5.0)
+        assert advanced_tools._wait_activity(d, "com.example.MainActivity", 5.0)
+        assert not advanced_tools._wait_activity(d, ".OtherActivity", 0.3)
+    finally:
+        _adb.get_shell("emulator-5554").close()
+    d.wait_activity.assert_not_called()
+
+
+def test_list_packages_parses_pm_output(monkeypatch):
+    """Test that package names are extracted from pm list packages output."""
+    shell = MagicMock()
+    shell.run.return_value = (
+        "package:com.android.settings\npackage:com.example.app",
+        0,
+    )
+    monkeypatch.setattr(_adb, "get_shell", lambda serial=None: shell)
+
+    assert _adb.list_packages("emulator-5554") == [
+        "com.android.settings",
+        "com.example.app",
+    ]
+    shell.run.assert_called_once_with("pm list packages")
+
+    _adb.list_packages("emulator-5554", third_party=True)
+    shell.run.assert_called_with("pm list packages -3")
+
+
+def test_parse_adb_devices_keeps_ready_devices_only():
+    """Test that only devices in the "device" state are reported."""
+    stdout = (
+        b"List of devices attached\r\n"
+        b"emulator-5554\tdevice\r\n"
+        b"R58M123\tunauthorized\r\n"
+        b"192.168.1.5:5555\tdevice product:x model:y\r\n"
+        b"\r\n"
+    )
+    assert _adb.parse_adb_devices(stdout) == ["emulator-5554", "192.168.1.5:5555"]
+
+
+def test_device_action_injects_device_and_reports_failure(monkeypatch):
+    """Test that device_action hides the device argument and maps errors to False."""
+    device = MagicMock()
+    monkeypatch.setattr(_device, "get_device", lambda device_id=None: device)
+
+    @_device.device_action
+    def press(d, key: str) -> bool:
+        d.press(key)
+
+    @_device.device_action
+    def broken(d) -> bool:
+        raise RuntimeError("device gone")
+
+    assert list(inspect.signature(press).parameters) == ["key", "device_id"]
+    assert press(key="home", device_id="emulator-5554") is True
+    device.press.assert_called_once_with("home")
+    assert broken() is False
+
+
+def test_find_dispatches_on_selector_type():
+    """Test that selector types map to the matching uiautomator2 keyword."""
+    d = MagicMock()
+
+    _selectors.find(d, "OK", "text")
+    _selectors.find(d, "app:id/ok", "resourceId")
+    _selectors.find(d, "Confirm", "description")
+
+    assert [c.kwargs for c in d.call_args_list] == [
+        {"text": "OK"},
+        {"resourceId": "app:id/ok"},
+        {"description": "Confirm"},
+    ]
+    assert _selectors.selector_kwargs("OK", "text") == {"text": "OK"}
+    assert _selectors.selector_kwargs("OK", "text") is _selectors.selector_kwargs(
+        "OK", "text"
+    )
+    with pytest.raises(ValueError):
+        _selectors.find(d, "OK", "xpath")
+
+
+def test_element_info_reused_until_state_changes(monkeypatch):
+    """Test that cached lookups reuse resolved elements until a mutating tool runs."""
+    monkeypatch.setattr(_selectors, "_elements", {})
+    d = MagicMock(serial="emulator-5554")
+    d.return_value.info = {"bounds": {"left": 0, "top": 10, "right": 100, "bottom": 30}}
+
+    info = _selectors.element_info(d, "OK", "text", 1.0)
+    assert _selectors.element_info(d, "OK", "text", 1.0) is info
+    assert d.return_value.wait.call_count == 0
+    assert _selectors.center(info) == (50, 20)
+    d.return_value.info = {"bounds": {"left": 0, "top": 40, "right": 100, "bottom": 60}}
+    moved = _selectors.element_info(d, "OK", "text", 1.0, cached=False)
+    assert _selectors.center(moved) == (50, 50)
+
+    monkeypatch.setattr(_registry, "_epoch", _registry._epoch + 1)
+    assert _selectors.cached_element(d, "OK", "text") is None
+
+    type(d.return_value).info = PropertyMock(
+        side_effect=UiObjectNotFoundError({"code": -32002, "data": "OK"})
+    )
+    d.return_value.wait.return_value = False
+    assert _selectors.element_info(d, "OK", "text", 1.0) is None
+    assert d.return_value.wait.call_count == 1
+    assert _selectors.element_info(d, "OK", "text", 0) is None
+    assert d.return_value.wait.call_count == 1
+
+
+def test_screenshot_writes_device_image_bytes(tmp_path):
+    """Test that PNG and JPEG screenshots are written without re-encoding."""
+    from tools.inspection_tools import _save_screenshot
+
+    d = MagicMock()
+    d._dev.shell.return_value = b"\x89PNG-data"
+    d.jsonrpc.takeScreenshot.return_value = base64.b64encode(b"jpeg-data").decode()
+
+    _save_screenshot(d, str(tmp_path / "shot.png"))
+    _save_screenshot(d, str(tmp_path / "shot.JPG"))
+    _save_screenshot(d, str(tmp_path / "shot.bmp"))
+
+    assert (tmp_path / "shot.png").read_bytes() == b"\x89PNG-data"
+    assert (tmp_path / "shot.JPG").read_bytes() == b"jpeg-data"
+    d.screenshot.assert_called_once_with(str(tmp_path / "shot.bmp"))
+
+    _save_screenshot(d, str(tmp_path / "small.jpg"), quality=60, scale=0.5)
+    d.jsonrpc.takeScreenshot.assert_called_with(0.5, 60)
+
+
+def test_scaled_screenshot_decodes_at_reduced_size(tmp_path):
+    """Test that a scaled capture is decoded at reduced size before resizing."""
+    from PIL import Image
+
+    from tools.inspection_tools import _save_screenshot
+
+    jpeg = io.BytesIO()
+    Image.new("RGB", (400, 800), "red").save(jpeg, "JPEG")
+    picture = Image.open(io.BytesIO(jpeg.getvalue()))
+    d = MagicMock()
+    d.screenshot.return_value = picture
+
+    _save_screenshot(d, str(tmp_path / "small.png"), scale=0.25)
+
+    assert picture.size == (100, 200)
+    assert Image.open(tmp_path / "small.png").size == (100, 200)
+
+
+def test_screenshot_skips_unchanged_screen(monkeypatch, tmp_path):
+    """Test that an identical capture is not written again when asked to skip it."""
+    from tools import inspection_tools
+
+    monkeypatch.setattr(inspection_tools, "_screenshot_digests", {})
+    d = MagicMock(serial="emulator-5554")
+    d._dev.shell.return_value = b"\x89PNG-data"
+
+    assert inspection_tools._save_screenshot(d, str(tmp_path / "a.png"), True)
+    assert not inspection_tools._save_screenshot(d, str(tmp_path / "b.png"), True)
+    assert not (tmp_path / "b.png").exists()
+
+    d._dev.shell.return_value = b"\x89PNG-other"
+    assert inspection_tools._save_screenshot(d, str(tmp_path / "b.png"), True)
+
+
+def test_parse_device_info_sections():
+    """Test parsing of the batched get_device_info shell output."""
+    from tools.device_tools import _INFO_MARKER, _parse_device_info
+
+    sections = [
+        "14",
+        "34",
+        "Google",
+        "Pixel 7",
+        "panther",
+        "Physical size: 1080x2400\nOverride size: 720x1600",
+        "Current Battery Service state:\n  AC powered: false\n  USB powered: true\n"
+        "  level: 87\n  status: 2\n  health: 2\n  voltage: 4312\n"
+        "  temperature: 251\n  technology: Li-ion",
+        "12: rmnet_data0    inet 10.20.30.40/30 scope global rmnet_data0\n"
+        "31: swlan0    inet 192.168.1.23/24 brd 192.168.1.255 scope global swlan0",
+        "  mWakefulness=Awake",
+    ]
+    info = _parse_device_info(f"\n{_INFO_MARKER}\n".join(sections))
+
+    assert info["resolution"] == "720x1600"
+    assert info["version"] == "14"
+    assert info["sdk"] == 34
+    assert info["battery"] == {
+        "ac_powered": False,
+        "usb_powered": True,
+        "level": 87,
+        "status": 2,
+        "health": 2,
+        "voltage": 4312,
+        "temperature": 25.1,
+        "technology": "Li-ion",
+    }
+    assert info["wifi_ip"] == "192.168.1.23"
+    assert info["manufacturer"] == "Google"
+    assert info["model"] == "Pixel 7"
+    assert info["product"] == "panther"
+    assert info["is_screen_on"] is True
+
+
+def test_probe_status_remembers_static_props(monkeypatch):
+    """Test that static properties are read once per device."""
+    from tools import device_tools
+
+    marker = device_tools._INFO_MARKER
+    shell = MagicMock()
+    shell.run.return_value = (
+        marker.join(
+            [
+                "14\n",
+                "34\n",
+                "Google\n",
+                "Pixel 7\n",
+                "panther\n",
+                "  mWakefulness=Awake\n",
+            ]
+        ),
+        0,
+    )
+    monkeypatch.setattr(device_tools, "get_shell", lambda serial: shell)
+    monkeypatch.setattr(device_tools, "_static_sections", {})
+
+    info, screen_on = device_tools._probe_status("emulator-5554")
+    assert info == {
+        "manufacturer": "Google",
+        "model": "Pixel 7",
+        "serial": "emulator-5554",
+        "version": "14",
+        "sdk": 34,
+    }
+    assert screen_on is True
+
+    shell.run.return_value = ("  mWakefulness=Asleep", 0)
+    assert device_tools._probe_status("emulator-5554") == (info, False)
+    assert shell.run.call_args.args == (device_tools._STATUS_DYNAMIC_COMMAND,)
+
+    shell.run.return_value = ("error: device offline", 1)
+    with pytest.raises(RuntimeError):
+        device_tools._probe_status("emulator-5556")
+
+
+def test_device_status_needs_uiautomator2_for_readiness(monkeypatch):
+    """Test that an adb-only device is reported but not ready for automation."""
+    from tools import device_tools
+
+    registered = {}
+    mcp = MagicMock()
+    mcp.tool = lambda **kwargs: lambda fn: registered.setdefault(kwargs["name"], fn)
+    monkeypatch.setattr(device_tools, "start_warmup", lambda: None)
+    device_tools.register_device_tools(mcp)
+
+    info = {"model": "Pixel 7", "serial": "emulator-5554"}
+
+    async def ready_devices():
+        return ["emulator-5554"]
+
+    def fail(device_id=None):
+        raise ConnectionError("uiautomator server not running")
+
+    monkeypatch.setattr(device_tools, "get_adb_path", lambda: "/usr/bin/adb")
+    monkeypatch.setattr(device_tools, "ready_devices", ready_devices)
+    monkeypatch.setattr(device_tools, "_probe_status", lambda serial: (info, True))
+    monkeypatch.setattr(device_tools, "_read_info", fail)
+
+    status = asyncio.run(registered["get_device_status"]())
+    assert status["device_info"] == info and status["screen_on"] is True
+    assert status["device_connected"] is False
+    assert status["ready_for_automation"] is False
+    assert "uiautomator server not running" in status["error"]
+
+    monkeypatch.setattr(
+        device_tools, "_read_info", lambda device_id=None: (None, {"screenOn": False})
+    )
+    status = asyncio.run(registered["get_device_status"]())
+    assert status["ready_for_automation"] is True and status["screen_on"] is True
+
+
+def test_device_status_probes_one_device(monkeypatch):
+    """Test that info and readiness come from the same device when several are attached."""
+    from tools import device_tools
+
+    registered = {}
+    mcp = MagicMock()
+    mcp.tool = lambda **kwargs: lambda fn: registered.setdefault(kwargs["name"], fn)
+    monkeypatch.setattr(device_tools, "start_warmup", lambda: None)
+    device_tools.register_device_tools(mcp)
+
+    async def ready_devices():
+        return ["emulator-5554", "emulator-5556"]
+
+    probed, read = [], []
+
+    def probe_status(serial):
+        probed.append(serial)
+        return {"serial": serial}, True
+
+    def read_info(device_id=None):
+        read.append(device_id)
+        return None, {"screenOn": True}
+
+    monkeypatch.setattr(device_tools, "get_adb_path", lambda: "/usr/bin/adb")
+    monkeypatch.setattr(device_tools, "ready_devices", ready_devices)
+    monkeypatch.setattr(device_tools, "_probe_status", probe_status)
+    monkeypatch.setattr(device_tools, "_read_info", read_info)
+
+    status = asyncio.run(registered["get_device_status"]())
+    assert probed == read == ["emulator-5554"]
+    assert status["device_info"] == {"serial": "emulator-5554"}
+    assert status["ready_for_automation"] is True
+
+
+def test_jsonrpc_batch_falls_back_to_single_calls(monkeypatch):
+    """Test that calls are replayed one by one when batching is unavailable."""
+    import uiautomator2.core
+
+    def no_batch(*args, **kwargs):
+        raise RuntimeError("batch not supported")
+
+    monkeypatch.setattr(uiautomator2.core, "_http_request", no_batch)
+    d = MagicMock()
+    d.jsonrpc_call.side_effect = [True, RuntimeError("boom")]
+
+    results = _device.jsonrpc_batch(
+        d, [{"method": "click", "params": [1, 2]}, {"method": "pressKey"}]
+    )
+
+    assert results == [
+        {"id": 0, "result": True},
+        {"id": 1, "error": {"message": "boom"}},
+    ]
+    d.jsonrpc_call.assert_any_call("click", [1, 2], 10.0)
+
+
+def test_u2_internals_skipped_on_untested_version(monkeypatch, caplog):
+    """Test that an untested uiautomator2 version uses the public API and warns."""
+    import uiautomator2.core
+
+    from tools import _u2compat
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("private request helper used")
+
+    monkeypatch.setattr(uiautomator2.core, "_http_request", unexpected)
+    monkeypatch.setattr(_u2compat.metadata, "version", lambda name: "4.0.0")
+    monkeypatch.setattr(_u2compat, "_warned", set())
+    _u2compat._tested_version.cache_clear()
+    try:
+        d = MagicMock()
+        d.jsonrpc_call.return_value = True
+        with caplog.at_level("WARNING", logger=_u2compat.__name__):
+            assert _device.jsonrpc_batch(d, [{"method": "click"}]) == [
+                {"id": 0, "result": True}
+            ]
+            with pytest.raises(_u2compat.InternalsUnavailable):
+                _u2compat.shell_bytes(d, "screencap -p")
+        assert "jsonrpc_batch: falling back" in caplog.text
+    finally:
+        _u2compat._tested_version.cache_clear()
+
+
+def test_preread_advises_every_file(monkeypatch, tmp_path):
+    """Test that page cache warm-up advises the kernel about each file in a tree."""
+    from tools import _warmup
+
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "u2.jar").write_bytes(b"jar")
+    (tmp_path / "adb").write_bytes(b"adb")
+    advised = []
+    monkeypatch.setattr(
+        _warmup.os,
+        "posix_fadvise",
+        lambda fd, offset, length, advice: advised.append(advice),
+        raising=False,
+    )
+
+    _warmup._preread(str(tmp_path))
+    _warmup._preread(str(tmp_path / "missing"))
+    assert len(advised) == 2
+
+
+def test_device_info_reused_until_state_changes(monkeypatch):
+    """Test that d.info is fetched once per epoch within the TTL."""
+    d = MagicMock(serial="emulator-5554")
+    info = PropertyMock(return_value={"screenOn": True})
+    type(d).info = info
+    monkeypatch.setattr(_device, "_info_cache", {})
+    monkeypatch.setattr(_registry, "_epoch", 0)
+
+    assert _device.device_info(d) == {"screenOn": True}
+    _device.device_info(d)
+    assert info.call_count == 1
+
+    _device.device_info(d, max_age=0)
+    assert info.call_count == 2
+
+    monkeypatch.setattr(_registry, "_epoch", 1)
+    _device.device_info(d)
+    assert info.call_count == 3
+
+
+def test_unlock_screen_skips_repeat_calls(monkeypatch):
+    """Test that unlock_screen does nothing right after a successful unlock."""
+    from tools import screen_tools
+
+    registered = {}
+    mcp = MagicMock()
+    mcp.tool = lambda **kwargs: lambda fn: registered.setdefault(kwargs["name"], fn)
+    screen_tools.register_screen_tools(mcp)
+
+    d = MagicMock(serial="emulator-5554")
+    type(d).info = PropertyMock(return_value={"screenOn": False})
+    monkeypatch.setattr(_device, "get_device", lambda device_id=None: d)
+    monkeypatch.setattr(_device, "_info_cache", {})
+    monkeypatch.setattr(screen_tools, "_unlocked_at", {})
+
+    assert registered["unlock_screen"]() is True
+    assert registered["unlock_screen"]() is True
+    d.swipe.assert_called_once()
+
+    registered["screen_off"]()
+    monkeypatch.setattr(_registry, "_epoch", _registry._epoch + 1)
+    registered["unlock_screen"]()
+    assert d.swipe.call_count == 2
@@ -11,6 +11,7 @@ Modules:
 - input_tools: User input simulation (click, swipe, text input, key press)
 - inspection_tools: UI element inspection and hierarchy analysis
 - advanced_tools: Advanced features (toast messages, activity waiting)
+- batch_tools: Running several tool calls in a single request
 """
 
 # Import all tool modules
@@ -20,21 +21,28 @@ from . import screen_tools
 from . import input_tools
 from . import inspection_tools
 from . import advanced_tools
+from . import batch_tools
+from ._registry import ToolRegistrar
 
 
 # Convenience function to register all tools at once
 def register_all_tools(mcp):
     """Register all tool modules with the MCP server.
 
+    Blocking tools are registered through a ``ToolRegistrar`` so they run in
+    worker threads rather than on the server's event loop.
+
     Args:
         mcp: The FastMCP server instance
     """
+    mcp = ToolRegistrar(mcp)
     device_tools.register_device_tools(mcp)
     app_tools.register_app_tools(mcp)
     screen_tools.register_screen_tools(mcp)
     input_tools.register_input_tools(mcp)
     inspection_tools.register_inspection_tools(mcp)
     advanced_tools.register_advanced_tools(mcp)
+    batch_tools.register_batch_tools(mcp)
 
 
 # Export the registration function
@@ -0,0 +1,252 @@
+"""
+Helpers for invoking the host ``adb`` binary.
+
+Resolving ``adb`` with ``shutil.which`` walks ``$PATH`` and stats every
+candidate directory, so the path is looked up once and reused. A missing
+``adb`` is looked up again on the next call, so installing platform-tools
+while the server is running is picked up without a restart.
+
+Ready devices are listed by asking the adb server directly over its TCP
+socket with ``adbutils``, which avoids spawning an ``adb`` client process.
+If the server is not running yet, ``adb devices`` is run instead (which
+starts it); its output is reused for ``ADB_DEVICES_TTL`` seconds, since
+status and connection tools tend to be called back to back.
+
+Device-side commands can be run through ``get_shell(serial)``, which keeps
+one ``adb shell`` process open per device instead of spawning one per call.
+"""
+
+import asyncio
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ._registry import run_blocking
+
+_ADB_PATH: Optional[str] = shutil.which("adb")
+
+# Seconds a successful ``adb devices`` result is reused.
+ADB_DEVICES_TTL = 2.0
+
+# (expiry, stdout) of the last successful ``adb devices`` run
+_devices_output: Optional[Tuple[float, bytes]] = None
+
+# Focused window in ``dumpsys window windows``; same pattern adbutils uses
+FOCUS_RE = re.compile(
+    r"mCurrentFocus=Window\{.*\s+(?P<package>[^\s]+)/(?P<activity>[^\s]+)\}"
+)
+
+# Serials in state "device" (ready for commands) in ``adb devices`` output
+_DEVICE_RE = re.compile(rb"^(\S+)\s+device\b", re.M)
+
+
+def get_adb_path() -> Optional[str]:
+    """Return the path of the ``adb`` executable, or None if it is not installed."""
+    global _ADB_PATH
+    if _ADB_PATH is None:
+        _ADB_PATH = shutil.which("adb")
+    return _ADB_PATH
+
+
+def invalidate_adb_cache() -> None:
+    """Forget the cached ``adb`` path and device list so both are looked up again."""
+    global _ADB_PATH, _devices_output
+    _ADB_PATH = None
+    _devices_output = None
+
+
+def parse_adb_devices(stdout: bytes) -> List[str]:
+    """Extract the serials of ready devices from raw ``adb devices`` output.
+
+    Devices in other states (``unauthorized``, ``offline``, ...) are skipped.
+    """
+    return [m.group(1).decode() for m in _DEVICE_RE.finditer(stdout)]
+
+
+async def adb_devices() -> bytes:
+    """Run ``adb devices`` without blocking the event loop.
+
+    Output from a run less than ``ADB_DEVICES_TTL`` seconds ago is reused.
+
+    Returns:
+        The raw stdout of the command
+
+    Raises:
+        RuntimeError: If adb is not installed
+        subprocess.CalledProcessError: If adb exits with an error
+    """
+    global _devices_output
+    if _devices_output is not None and _devices_output[0] > time.monotonic():
+        return _devices_output[1]
+
+    adb_path = get_adb_path()
+    if not adb_path:
+        raise RuntimeError("adb command not found in PATH")
+    proc = await asyncio.create_subprocess_exec(
+        adb_path,
+        "devices",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(
+            proc.returncode, [adb_path, "devices"], stdout, stderr
+        )
+    _devices_output = (time.monotonic() + ADB_DEVICES_TTL, stdout)
+    return stdout
+
+
+async def ready_devices() -> List[str]:
+    """List the serials of devices that are ready for commands.
+
+    The adb server is queried over its socket; if that fails (typically
+    because the server is not running) ``adb devices`` is run instead.
+
+    Raises:
+        RuntimeError: If the server is unreachable and adb is not installed
+        subprocess.CalledProcessError: If adb exits with an error
+    """
+    from adbutils import adb as adb_server
+
+    try:
+        infos = await run_blocking(adb_server.list)
+    except Exception:
+        return parse_adb_devices(await adb_devices())
+    return [info.serial for info in infos if info.state == "device"]
+
+
+def follow_logcat(serial: Optional[str], since: str, *filterspecs: str):
+    """Start ``adb logcat`` printing entries from ``since`` onwards as they arrive.
+
+    Only entries matching ``filterspecs`` (e.g. ``"ActivityTaskManager:I"``)
+    are printed. The caller must kill the returned process.
+
+    Args:
+        serial: Device serial, or None for the only connected device
+        since: Device time in logcat's ``MM-DD hh:mm:ss.mmm`` format
+        filterspecs: logcat tag filters
+
+    Raises:
+        RuntimeError: If adb is not installed
+    """
+    adb_path = get_adb_path()
+    if not adb_path:
+        raise RuntimeError("adb command not found in PATH")
+    args = [adb_path] + (["-s", serial] if serial else [])
+    args += ["logcat", "-v", "brief", "-T", since, *filterspecs, "*:S"]
+    return subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+class AdbShell:
+    """A long-lived ``adb shell`` process for running device-side commands.
+
+    Spawning ``adb shell`` per command forks a host process and performs a
+    new adb handshake each time. This keeps one shell open per device and
+    writes commands to its stdin, each followed by an ``echo`` of a marker
+    carrying the exit status, then reads output up to that marker.
+
+    Args:
+        serial: Device serial, or None for the only connected device
+    """
+
+    _MARK = "__MCP_ADB_DONE__"
+
+    def __init__(self, serial: Optional[str] = None):
+        self.serial = serial
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> subprocess.Popen:
+        adb_path = get_adb_path()
+        if not adb_path:
+            raise RuntimeError("adb command not found in PATH")
+        args = [adb_path] + (["-s", self.serial] if self.serial else []) + ["shell"]
+        return subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+
+    def run(self, command: str, timeout: float = 10.0) -> Tuple[str, int]:
+        """Run a shell command on the device.
+
+        Args:
+            command: Shell command line; may contain ``;`` separated commands
+            timeout: Seconds to wait before the shell is killed
+
+        Returns:
+            Tuple of (stdout, exit code of the last command)
+        """
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._proc = self._start()
+            proc = self._proc
+            # Killing the process unblocks readline() if the device stops answering
+            timer = threading.Timer(timeout, proc.kill)
+            timer.start()
+            try:
+                proc.stdin.write(f"{command}\necho {self._MARK}$?\n".encode())
+                proc.stdin.flush()
+                lines = []
+                while True:
+                    line = proc.stdout.readline()
+                    if not line:
+                        raise RuntimeError(f"adb shell exited while running: {command}")
+                    text = line.decode("utf-8", "replace").rstrip("\r\n")
+                    # Output without a trailing newline puts the marker at
+                    # the end of its last line
+                    output, marked, status = text.rpartition(self._MARK)
+                    if marked:
+                        if output:
+                            lines.append(output)
+                        return "\n".join(lines), int(status or 0)
+                    lines.append(text)
+            except BaseException:
+                proc.kill()
+                self._proc = None
+                raise
+            finally:
+                timer.cancel()
+
+    def close(self) -> None:
+        """Terminate the shell process."""
+        with self._lock:
+            if self._proc is not None:
+                self._proc.kill()
+                self._proc = None
+
+
+_shells: Dict[Optional[str], AdbShell] = {}
+_shells_lock = threading.Lock()
+
+
+def get_shell(serial: Optional[str] = None) -> AdbShell:
+    """Return the persistent ``adb shell`` session for a device."""
+    with _shells_lock:
+        shell = _shells.get(serial)
+        if shell is None:
+            shell = _shells[serial] = AdbShell(serial)
+        return shell
+
+
+def list_packages(serial: Optional[str] = None, third_party: bool = False) -> List[str]:
+    """List installed package names with ``pm list packages`` on the device's shell.
+
+    Args:
+        serial: Device serial, or None for the only connected device
+        third_party: Only list user-installed packages (``pm list packages -3``)
+
+    Raises:
+        RuntimeError: If the command fails
+    """
+    command = "pm list packages -3" if third_party else "pm list packages"
+    output, exit_code = get_shell(serial).run(command)
+    if exit_code:
+        raise RuntimeError(f"{command} exited with status {exit_code}")
+    return [line[8:] for line in output.splitlines() if line.startswith("package:")]
@@ -0,0 +1,359 @@
+"""
+Shared uiautomator2 device connections.
+
+``u2.connect()`` is expensive: it resolves the adb device, checks (and if
+needed pushes) the uiautomator2 server jar and pings the on-device server
+before returning. Tools therefore obtain devices through ``get_device``,
+which keeps one long-lived ``u2.Device`` per device and reuses it for
+every subsequent call. A device is cached under both the id it was
+requested with and its serial, so ``None`` and the explicit serial of the
+default device share one connection.
+
+A cached connection can go stale when the device reboots or adb restarts.
+``with_device`` runs an action against the cached device and, if it fails
+with a connection error, reconnects once and retries.
+
+uiautomator2 (with adbutils, requests and PIL behind it) is imported on
+first connect rather than at server startup, so a session that never
+touches a device does not pay for it.
+"""
+
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ._registry import current_epoch
+from ._u2compat import post_jsonrpc, warn_fallback
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Seconds between background pings that keep cached sessions warm.
+KEEPALIVE_INTERVAL = 15.0
+
+# UiAutomator Configurator values. Fast mode skips the wait-for-idle that
+# the on-device server otherwise runs before every lookup and action, which
+# can take seconds on animated screens; the tools pass explicit timeouts to
+# the waits they need. The defaults are UiAutomator's own.
+FAST_CONFIGURATOR = {
+    "waitForIdleTimeout": 0,
+    "waitForSelectorTimeout": 0,
+    "actionAcknowledgmentTimeout": 500,
+    "keyInjectionDelay": 0,
+}
+DEFAULT_CONFIGURATOR = {
+    "waitForIdleTimeout": 10000,
+    "waitForSelectorTimeout": 10000,
+    "actionAcknowledgmentTimeout": 3000,
+    "keyInjectionDelay": 0,
+}
+
+# Whether new connections are switched to FAST_CONFIGURATOR.
+_fast_mode = True
+
+# Opt-in: turn off window, transition and animator animations on every newly
+# connected device, so actions do not wait for animations to play out. These
+# are global device settings and stay off after the server exits.
+DISABLE_ANIMATIONS = os.getenv("MCP_DISABLE_ANIMATIONS", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+_DISABLE_ANIMATIONS_COMMAND = "; ".join(
+    f"settings put global {name} 0"
+    for name in (
+        "window_animation_scale",
+        "transition_animation_scale",
+        "animator_duration_scale",
+    )
+)
+
+# Seconds a ``d.info`` answer is reused by ``device_info``.
+INFO_TTL = 0.5
+INFO_CACHE_SIZE = 64
+
+_devices: Dict[Optional[str], Any] = {}
+# (serial, tool mutation epoch) -> (fetch time, d.info)
+_info_cache: Dict[Tuple[str, int], Tuple[float, Dict[str, Any]]] = {}
+_lock = threading.Lock()
+_keepalive_thread: Optional[threading.Thread] = None
+
+
+def __getattr__(name: str) -> Any:
+    # Module attributes that need uiautomator2, resolved on first access (PEP 562)
+    if name == "u2":
+        import uiautomator2
+
+        return uiautomator2
+    if name == "CONNECTION_ERRORS":
+        return _connection_errors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.cache
+def _connection_errors() -> Tuple[type, ...]:
+    """Errors that mean the cached connection is unusable, as opposed to the
+    action itself failing (element not found, invalid argument, ...)."""
+    import uiautomator2 as u2
+
+    return (
+        ConnectionError,
+        u2.adbutils.AdbError,
+        u2.exceptions.ConnectError,
+        u2.exceptions.HTTPError,
+    )
+
+
+def get_device(device_id: Optional[str] = None):
+    """Return a cached uiautomator2 device, connecting on first use.
+
+    Args:
+        device_id: Optional device identifier. If not provided, the first
+            available device is used.
+
+    Returns:
+        The connected ``u2.Device`` instance.
+    """
+    d = _devices.get(device_id)
+    if d is not None:
+        return d
+    with _lock:
+        d = _devices.get(device_id)
+        if d is None:
+            import uiautomator2 as u2
+
+            d = u2.connect(device_id)
+            if d.serial not in _devices:
+                _configure(d, _fast_mode)
+                if DISABLE_ANIMATIONS:
+                    _disable_animations(d)
+            d = _devices.setdefault(d.serial, d)
+            _devices[device_id] = d
+            _start_keepalive()
+    return d
+
+
+def _configure(d, fast: bool) -> None:
+    try:
+        d.jsonrpc.setConfigurator(FAST_CONFIGURATOR if fast else DEFAULT_CONFIGURATOR)
+    except Exception as e:
+        log.warning("Could not configure %s: %s", d.serial, e)
+
+
+def _disable_animations(d) -> None:
+    try:
+        d.shell(_DISABLE_ANIMATIONS_COMMAND)
+    except Exception as e:
+        log.warning("Could not disable animations on %s: %s", d.serial, e)
+
+
+def set_fast_mode(enabled: bool) -> int:
+    """Switch cached and future connections between fast and default timing.
+
+    Returns:
+        Number of cached devices that were reconfigured
+    """
+    global _fast_mode
+    _fast_mode = enabled
+    devices = {id(d): d for d in list(_devices.values())}.values()
+    for d in devices:
+        _configure(d, enabled)
+    return len(devices)
+
+
+def with_device(
+    device_id: Optional[str], action: Callable[[Any], Any], retry: bool = True
+) -> Any:
+    """Call ``action(d)`` with the cached device for ``device_id``.
+
+    If the call fails with one of ``CONNECTION_ERRORS`` (other than a plain
+    timeout) the cached connection is dropped. With ``retry`` the action is
+    then run once more on a fresh connection. Actions that change device
+    state pass ``retry=False``: the request may have reached the device
+    before the connection broke, and replaying it would repeat the gesture
+    or text entry, so the error is raised instead.
+    """
+    d = get_device(device_id)
+    try:
+        return action(d)
+    except _connection_errors() as e:
+        from uiautomator2.exceptions import HTTPTimeoutError
+
+        if isinstance(e, HTTPTimeoutError):
+            raise
+        log.info("Reconnecting to %s after: %s", d.serial, e)
+        with _lock:
+            _evict(d)
+        if not retry:
+            raise
+        return action(get_device(device_id))
+
+
+def device_action(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Turn ``fn(d, ...)`` into a tool function taking ``device_id``.
+
+    The wrapper resolves the cached device through ``with_device``, without
+    replaying ``fn`` after a connection error, and passes it as the first
+    argument. Any exception is logged and turned into False, and a ``None``
+    result means success (True). The exposed signature is ``fn``'s without
+    ``d``, plus a trailing ``device_id``.
+    """
+    signature = inspect.signature(fn)
+    parameters = list(signature.parameters.values())[1:]
+    parameters.append(
+        inspect.Parameter(
+            "device_id",
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            default=None,
+            annotation=Optional[str],
+        )
+    )
+
+    @functools.wraps(fn)
+    def wrapper(*args, device_id: Optional[str] = None, **kwargs):
+        try:
+            result = with_device(
+                device_id, lambda d: fn(d, *args, **kwargs), retry=False
+            )
+            return True if result is None else result
+        except Exception as e:
+            log.warning("%s failed: %s", fn.__name__, e)
+            return False
+
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    annotations = dict(fn.__annotations__)
+    annotations.pop(next(iter(signature.parameters)), None)
+    annotations["device_id"] = Optional[str]
+    wrapper.__annotations__ = annotations
+    return wrapper
+
+
+def device_info(d, max_age: float = INFO_TTL) -> Dict[str, Any]:
+    """Return ``d.info``, reusing an answer at most ``max_age`` seconds old.
+
+    Status and info tools polled back to back share one RPC. Answers are
+    keyed by the tool mutation epoch, so any state-changing tool call (such
+    as starting an app or turning the screen off) forces a fresh read.
+    """
+    key = (d.serial, current_epoch())
+    now = time.monotonic()
+    cached = _info_cache.get(key)
+    if cached is not None and now - cached[0] < max_age:
+        return cached[1]
+    info = d.info
+    _info_cache.pop(key, None)
+    if len(_info_cache) >= INFO_CACHE_SIZE:
+        _info_cache.pop(next(iter(_info_cache)))
+    _info_cache[key] = (now, info)
+    return info
+
+
+def jsonrpc_batch(d, calls: List[Dict[str, Any]], timeout: float = 10.0) -> List[Any]:
+    """Send several JSON-RPC calls to the on-device uiautomator server at once.
+
+    uiautomator2 opens a new forwarded HTTP connection for every call; a
+    JSON-RPC 2.0 batch sends them all in one request. If the server does not
+    answer with a batch response, or the uiautomator2 internals the batch
+    needs are unavailable (see ``_u2compat``), the calls are replayed one by
+    one and a warning is logged.
+
+    Args:
+        d: Connected device
+        calls: List of {"method": str, "params": list} dictionaries
+        timeout: HTTP timeout in seconds
+
+    Returns:
+        One JSON-RPC response dictionary ("result" or "error") per call, in order
+    """
+    payload = [
+        {
+            "jsonrpc": "2.0",
+            "id": i,
+            "method": c["method"],
+            "params": c.get("params", []),
+        }
+        for i, c in enumerate(calls)
+    ]
+    try:
+        # uiautomator2 has no public batch API
+        response = post_jsonrpc(d, payload, timeout)
+    except Exception as e:
+        response = e
+
+    if isinstance(response, list):
+        return sorted(response, key=lambda r: r.get("id", 0))
+    warn_fallback("jsonrpc_batch", response)
+
+    results = []
+    for request in payload:
+        try:
+            result = d.jsonrpc_call(request["method"], request["params"], timeout)
+            results.append({"id": request["id"], "result": result})
+        except Exception as e:
+            results.append({"id": request["id"], "error": {"message": str(e)}})
+    return results
+
+
+def clear_devices(device_id: Optional[str] = None) -> int:
+    """Drop cached connections so the next call reconnects.
+
+    Args:
+        device_id: Device to drop (by requested id or serial). If not
+            provided, every cached device is dropped.
+
+    Returns:
+        Number of distinct devices dropped
+    """
+    with _lock:
+        if device_id is None:
+            dropped = {id(d) for d in _devices.values()}
+            _devices.clear()
+            return len(dropped)
+        d = _devices.get(device_id)
+        if d is None:
+            return 0
+        _evict(d)
+        return 1
+
+
+def _evict(d) -> None:
+    for key in [key for key, cached in _devices.items() if cached is d]:
+        del _devices[key]
+
+
+def close_all() -> None:
+    """Drop every cached device connection.
+
+    The on-device uiautomator server is left running so the next server
+    process can attach to it without restarting it.
+    """
+    clear_devices()
+
+
+def _start_keepalive() -> None:
+    global _keepalive_thread
+    if _keepalive_thread is None:
+        _keepalive_thread = threading.Thread(
+            target=_keepalive_loop, name="u2-keepalive", daemon=True
+        )
+        _keepalive_thread.start()
+
+
+def _keepalive_loop() -> None:
+    """Ping cached devices so idle sessions are not dropped between tool calls.
+
+    Devices that no longer answer are evicted and reconnected on next use.
+    """
+    while True:
+        time.sleep(KEEPALIVE_INTERVAL)
+        for d in {id(d): d for d in list(_devices.values())}.values():
+            try:
+                # Also refreshes the answer device_info hands out
+                device_info(d, max_age=0)
+            except Exception:
+                with _lock:
+                    _evict(d)
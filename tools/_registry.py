@@ -0,0 +1,226 @@
+"""
+Tool registration helpers shared by all tool modules.
+
+uiautomator2 and adb calls are blocking. FastMCP runs synchronous tool
+functions directly on its event loop, so a single slow device round-trip
+would stall every other in-flight request. ``ToolRegistrar`` wraps the
+FastMCP server so that every synchronous tool is executed in a worker
+thread instead, while calls against the same device are bounded by a
+per-device semaphore.
+
+Results of short-lived read-only tools are also cached for a few seconds,
+since agents tend to re-ask the same question between actions. Any tool
+that may change device state invalidates those cached results.
+
+When ``prometheus-client`` is installed, every call is timed into the
+``mcp_tool_seconds`` histogram.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import anyio
+
+try:
+    from prometheus_client import Histogram
+except ImportError:  # metrics are optional
+    Histogram = None
+
+# Maximum number of concurrent calls against a single device. Calls for
+# different devices never wait on each other.
+PER_DEVICE_CONCURRENCY = 4
+
+# Worker threads shared by all offloaded tool calls.
+_THREAD_LIMITER = anyio.CapacityLimiter((os.cpu_count() or 1) * 4)
+
+_device_semaphores: Dict[Optional[str], asyncio.Semaphore] = {}
+
+# Read-only tools whose results may be reused for this many seconds.
+READ_ONLY_TTL: Dict[str, float] = {
+    "get_device_status": 2.0,
+    "get_device_info": 5.0,
+    "get_current_app": 0.5,
+    "get_element_info": 0.5,
+}
+
+# Tools that never change device state, so they leave cached results valid.
+# Every other tool invalidates the cache once it returns.
+NON_MUTATING = {
+    "batch_execute",
+    "build_ui_snapshot",
+    "check_adb_and_list_devices",
+    "dump_hierarchy",
+    "dump_hierarchy_compact",
+    "find_elements_xpath",
+    "get_installed_apps",
+    "get_toast",
+    "mcp_health",
+    "parallel_exec",
+    "refresh_adb_path",
+    "screenshot",
+    "wait_activity",
+    "wait_for_element",
+    "wait_for_screen_on",
+    *READ_ONLY_TTL,
+}
+
+RESULT_CACHE_SIZE = 256
+
+# (tool name, epoch, arguments) -> (expiry, result)
+_results: Dict[Tuple, Tuple[float, Any]] = {}
+# Bumped by every state-changing tool call; part of each cache key.
+_epoch = 0
+
+# Per-tool latency as seen by the client, including cache hits.
+TOOL_LATENCY = (
+    Histogram(
+        "mcp_tool_seconds",
+        "Tool call latency in seconds",
+        ["tool", "outcome"],
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+    )
+    if Histogram is not None
+    else None
+)
+
+# Registered tool name -> callable (as registered, i.e. after offloading).
+# Used by tools that dispatch to other tools in-process, such as batch_execute.
+TOOLS: Dict[str, Callable[..., Any]] = {}
+
+
+def _device_semaphore(device_id: Optional[str]) -> asyncio.Semaphore:
+    semaphore = _device_semaphores.get(device_id)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PER_DEVICE_CONCURRENCY)
+        _device_semaphores[device_id] = semaphore
+    return semaphore
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking call on the worker threads shared by all offloaded tools."""
+    return await anyio.to_thread.run_sync(fn, *args, limiter=_THREAD_LIMITER)
+
+
+def offload(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Turn a blocking tool function into a coroutine that runs in a worker thread.
+
+    Coroutine functions are returned unchanged. The wrapper keeps the
+    original signature and docstring so FastMCP builds the same schema.
+    """
+    if inspect.iscoroutinefunction(fn):
+        return fn
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        async with _device_semaphore(kwargs.get("device_id")):
+            return await run_blocking(functools.partial(fn, *args, **kwargs))
+
+    return wrapper
+
+
+def current_epoch() -> int:
+    """Return a counter that changes whenever a tool may have changed device state."""
+    return _epoch
+
+
+def cache_result(name: str, fn: Callable[..., Any], ttl: float) -> Callable[..., Any]:
+    """Reuse the result of an async read-only tool for ``ttl`` seconds.
+
+    Failed calls (``{"success": False, ...}``) are never cached.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        try:
+            key = (name, _epoch, args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return await fn(*args, **kwargs)
+
+        cached = _results.get(key)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        result = await fn(*args, **kwargs)
+        if not (isinstance(result, dict) and result.get("success") is False):
+            if len(_results) >= RESULT_CACHE_SIZE:
+                _results.pop(next(iter(_results)))
+            _results[key] = (now + ttl, result)
+        return result
+
+    return wrapper
+
+
+def invalidate_results(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Discard all cached read-only results once an async tool returns."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        global _epoch
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            _epoch += 1
+            _results.clear()
+
+    return wrapper
+
+
+def record_latency(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Observe the duration of an async tool in ``TOOL_LATENCY``.
+
+    A call counts as an error when it raises, returns False or returns
+    ``{"success": False, ...}``.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+            if result is not False and not (
+                isinstance(result, dict) and result.get("success") is False
+            ):
+                outcome = "ok"
+            return result
+        finally:
+            TOOL_LATENCY.labels(name, outcome).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+class ToolRegistrar:
+    """Proxy around a FastMCP server whose ``tool`` decorator offloads blocking
+    tools and applies the read-only result cache.
+
+    All other attributes are forwarded to the wrapped server.
+    """
+
+    def __init__(self, mcp):
+        self._mcp = mcp
+
+    def tool(self, *args, **kwargs):
+        register = self._mcp.tool(*args, **kwargs)
+
+        def decorator(fn):
+            name = kwargs.get("name") or fn.__name__
+            wrapped = offload(fn)
+            if name in READ_ONLY_TTL:
+                wrapped = cache_result(name, wrapped, READ_ONLY_TTL[name])
+            elif name not in NON_MUTATING:
+                wrapped = invalidate_results(wrapped)
+            if TOOL_LATENCY is not None:
+                wrapped = record_latency(name, wrapped)
+            TOOLS[name] = wrapped
+            return register(wrapped)
+
+        return decorator
+
+    def __getattr__(self, name):
+        return getattr(self._mcp, name)
@@ -0,0 +1,115 @@
+"""
+Element lookup by selector type, shared by the input and inspection tools.
+
+Agents tend to re-inspect the element they just inspected or waited for.
+``element_info`` therefore remembers the ``el.info`` of recently resolved
+elements for half a second, keyed by the tool mutation epoch so that any
+state-changing tool call invalidates them. The screen can also change on
+its own (navigation, dialogs, the keyboard), so actions always resolve the
+element again before choosing where to tap.
+"""
+
+import functools
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from ._registry import current_epoch
+
+# selector_type -> uiautomator2 selector keyword
+SELECTORS: Dict[str, str] = {
+    "text": "text",
+    "resourceId": "resourceId",
+    "description": "description",
+}
+
+# Seconds a resolved element may be reused by read-only lookups while no tool
+# changes device state.
+ELEMENT_TTL = 0.5
+ELEMENT_CACHE_SIZE = 128
+
+# (serial, epoch, selector_type, selector) -> (expiry, el.info)
+_elements: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+
+
+@functools.lru_cache(maxsize=256)
+def selector_kwargs(selector: str, selector_type: str) -> Mapping[str, str]:
+    """Return the uiautomator2 selector keywords for ``selector``.
+
+    Agents hit the same few selectors over and over, so the read-only
+    mapping is built once per (selector, selector_type) and shared.
+
+    Raises:
+        ValueError: If selector_type is not one of SELECTORS
+    """
+    try:
+        return MappingProxyType({SELECTORS[selector_type]: selector})
+    except KeyError:
+        raise ValueError(f"Invalid selector_type: {selector_type}") from None
+
+
+def find(d, selector: str, selector_type: str):
+    """Return the UiObject matching ``selector`` by ``selector_type``.
+
+    Raises:
+        ValueError: If selector_type is not one of SELECTORS
+    """
+    return d(**selector_kwargs(selector, selector_type))
+
+
+def cached_element(d, selector: str, selector_type: str) -> Optional[Dict[str, Any]]:
+    """Return the remembered ``el.info`` for a selector, or None."""
+    key = (d.serial, current_epoch(), selector_type, selector)
+    cached = _elements.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def element_info(
+    d, selector: str, selector_type: str, timeout: float, cached: bool = True
+) -> Optional[Dict[str, Any]]:
+    """Return ``el.info`` of the matching element, or None if it never appears.
+
+    Waits up to ``timeout`` seconds if the element is not on screen yet.
+    With ``cached``, elements resolved recently are answered from memory;
+    actions pass ``cached=False`` so they never tap where an element was.
+
+    Raises:
+        ValueError: If selector_type is not one of SELECTORS
+    """
+    info = cached_element(d, selector, selector_type) if cached else None
+    if info is not None:
+        return info
+    from uiautomator2.exceptions import UiObjectNotFoundError
+
+    el = find(d, selector, selector_type)
+    try:
+        # objInfo answers with the node or NotFound in one RPC; only wait
+        # when the element is not there yet
+        info = el.info
+    except UiObjectNotFoundError:
+        if not timeout or not el.wait(timeout=timeout):
+            return None
+        info = el.info
+    if len(_elements) >= ELEMENT_CACHE_SIZE:
+        _elements.pop(next(iter(_elements)))
+    _elements[(d.serial, current_epoch(), selector_type, selector)] = (
+        time.monotonic() + ELEMENT_TTL,
+        info,
+    )
+    return info
+
+
+def forget_elements() -> None:
+    """Discard every remembered element, e.g. after an action within one tool call."""
+    _elements.clear()
+
+
+def center(info: Dict[str, Any]) -> Tuple[float, float]:
+    """Return the center of an element from its ``el.info``, as uiautomator2 does."""
+    bounds = info.get("visibleBounds") or info["bounds"]
+    return (
+        (bounds["left"] + bounds["right"]) / 2,
+        (bounds["top"] + bounds["bottom"]) / 2,
+    )
@@ -0,0 +1,91 @@
+"""
+Access to uiautomator2 internals that have no public API.
+
+Batched JSON-RPC and raw ``adb shell`` output need attributes uiautomator2
+keeps private (``uiautomator2.core._http_request``, ``Device._dev``,
+``Device._device_server_port``). They are only used on the uiautomator2
+minor versions listed in ``TESTED_VERSIONS``, the range pinned in
+pyproject.toml. On any other version, or if an attribute has gone, the
+accessors raise ``InternalsUnavailable`` and callers fall back to the
+public API. ``warn_fallback`` logs that once per feature.
+"""
+
+import functools
+import logging
+from importlib import metadata
+from typing import Any, Dict, List, Set
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# (major, minor) versions of uiautomator2 the internals were checked against
+TESTED_VERSIONS = {(3, 7)}
+
+_warned: Set[str] = set()
+
+
+class InternalsUnavailable(RuntimeError):
+    """The uiautomator2 internal an accessor needs is not available."""
+
+
+@functools.cache
+def _tested_version() -> bool:
+    try:
+        version = metadata.version("uiautomator2")
+        major, minor = (int(part) for part in version.split(".")[:2])
+    except (metadata.PackageNotFoundError, ValueError):
+        return False
+    return (major, minor) in TESTED_VERSIONS
+
+
+def _require_tested() -> None:
+    if not _tested_version():
+        raise InternalsUnavailable(
+            "uiautomator2 version is not one this server was tested with"
+        )
+
+
+def warn_fallback(feature: str, reason: Any) -> None:
+    """Log, once per ``feature``, that the public-API fallback is being used."""
+    if feature not in _warned:
+        _warned.add(feature)
+        log.warning(
+            "%s: falling back to the uiautomator2 public API (%s)", feature, reason
+        )
+
+
+def post_jsonrpc(d, payload: List[Dict[str, Any]], timeout: float) -> Any:
+    """POST a JSON-RPC payload to the on-device server and return the decoded answer.
+
+    This is the request helper uiautomator2's own ``jsonrpc_call`` uses.
+
+    Raises:
+        InternalsUnavailable: If the helper or the device attributes are missing
+    """
+    _require_tested()
+    try:
+        from uiautomator2.core import _http_request
+
+        adb_device, port = d._dev, d._device_server_port
+    except (ImportError, AttributeError) as e:
+        raise InternalsUnavailable(str(e)) from e
+    return _http_request(
+        adb_device, port, "POST", "/jsonrpc/0", payload, timeout
+    ).json()
+
+
+def shell_bytes(d, command: str) -> bytes:
+    """Run ``command`` over the device's adb connection and return raw stdout.
+
+    ``d.shell`` decodes output as text, which corrupts binary output such as
+    ``screencap -p``.
+
+    Raises:
+        InternalsUnavailable: If the device's adbutils handle is missing
+    """
+    _require_tested()
+    try:
+        adb_device = d._dev
+    except AttributeError as e:
+        raise InternalsUnavailable(str(e)) from e
+    return adb_device.shell(command, encoding=None)
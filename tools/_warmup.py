@@ -0,0 +1,75 @@
+"""
+Page cache warm-up for the files the first device call reads.
+
+The first ``u2.connect()`` runs the ``adb`` binary and may push the
+uiautomator2 server (``u2.jar``, ``app-uiautomator.apk``) from the package's
+assets directory. On a cold start those are read from disk while the client
+waits. ``start_warmup`` asks the kernel to read them ahead in a background
+thread, so the first tool call finds them in the page cache.
+
+Only available where ``os.posix_fadvise`` exists (Linux); elsewhere it does
+nothing.
+"""
+
+import importlib.util
+import os
+import threading
+from typing import Iterator, List
+
+from ._adb import get_adb_path
+
+_started = False
+
+
+def _warmup_paths() -> List[str]:
+    paths = []
+    adb_path = get_adb_path()
+    if adb_path:
+        paths.append(os.path.realpath(adb_path))
+    spec = importlib.util.find_spec("uiautomator2")
+    if spec is not None and spec.submodule_search_locations:
+        for location in spec.submodule_search_locations:
+            paths.append(os.path.join(location, "assets"))
+    return paths
+
+
+def _files(path: str) -> Iterator[str]:
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, _, names in os.walk(path):
+        for name in names:
+            yield os.path.join(root, name)
+
+
+def _preread(path: str) -> None:
+    """Ask the kernel to read every file under ``path`` into the page cache."""
+    for name in _files(path):
+        try:
+            fd = os.open(name, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _warmup() -> None:
+    for path in _warmup_paths():
+        _preread(path)
+
+
+def start_warmup() -> None:
+    """Start reading the adb binary and uiautomator2 assets ahead, once per process."""
+    global _started
+    if _started or not hasattr(os, "posix_fadvise"):
+        return
+    _started = True
+    threading.Thread(
+        target=_warmup,
+        name="page-cache-warmup",
+        daemon=True,
+    ).start()
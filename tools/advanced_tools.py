@@ -1,76 +1,174 @@
-import uiautomator2 as u2
+import logging
+import re
+import threading
+import time
 from typing import Optional
 
+from ._adb import FOCUS_RE, follow_logcat, get_shell
+from ._device import with_device
 
-def register_advanced_tools(mcp):
-    """Register all advanced tools with the MCP server."""
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
 
-    @mcp.tool(
-        name="get_toast",
-        description="Retrieve the text of the last toast message displayed on the device. Useful for verifying notifications, error messages, and user feedback.",
-    )
-    def get_toast(device_id: Optional[str] = None) -> str:
-        """Get the text content of the most recent toast message.
-
-        This function captures toast messages (temporary popup notifications) that
-        appear briefly on screen, which can be useful for verifying operations
-        or capturing system messages.
-
-        Args:
-            device_id: Optional device identifier. If not provided, uses the first available device
-
-        Returns:
-            str: The text content of the last toast message, or empty string if none found
-
-        Examples:
-            >>> get_toast()  # Get the last toast message
-            # Returns: "Download completed successfully"
-
-        Note:
-            Toast messages are temporary and may disappear quickly.
-            Call this function promptly after the action that triggers the toast.
-            The function waits up to 10 seconds for a toast message.
-        """
-        try:
-            d = u2.connect(device_id)
-            return d.toast.get_message(10.0) or ""
-        except Exception as e:
-            print(f"Failed to get toast message: {str(e)}")
-            return ""
-
-    @mcp.tool(
-        name="wait_activity",
-        description="Wait for a specific Android activity to appear on the screen. Useful for navigation verification and app state validation.",
+# Seconds between polls of the uiautomator server's last-toast buffer.
+TOAST_POLL_INTERVAL = 0.1
+
+
+# Activity launches as logged by the system server:
+#   "START u0 {... cmp=com.example/.MainActivity ...} from uid 10123"
+#   "Displayed com.example/.MainActivity: +312ms"
+_ACTIVITY_LOG_RE = re.compile(r"(?:cmp=|Displayed )([\w.]+)/([\w.$]+)")
+# ActivityTaskManager on Android 10+, ActivityManager before
+_ACTIVITY_LOG_TAGS = ("ActivityTaskManager:I", "ActivityManager:I")
+_DEVICE_TIME_RE = re.compile(r"^\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}$")
+
+
+def _activity_matches(activity: str, package: str, name: str) -> bool:
+    """Whether ``package``/``name`` from dumpsys or logcat is ``activity``.
+
+    ``activity`` may be fully qualified or relative to the package (".Main").
+    """
+    full = package + name if name.startswith(".") else name
+    return activity in (name, full) or (
+        activity.startswith(".") and full.endswith(activity)
     )
-    def wait_activity(
-        activity: str, timeout: float = 10.0, device_id: Optional[str] = None
-    ) -> bool:
-        """Wait for a specific Android activity to become the current foreground activity.
-
-        This function monitors the device and waits until the specified activity
-        appears in the foreground, which is useful for verifying navigation
-        and app state transitions.
-
-        Args:
-            activity: The full activity name to wait for (e.g., "com.example.app.MainActivity")
-            timeout: Maximum time in seconds to wait (default: 10.0)
-            device_id: Optional device identifier. If not provided, uses the first available device
-
-        Returns:
-            bool: True if the activity appeared within the timeout, False otherwise
-
-        Examples:
-            >>> wait_activity("com.android.settings.Settings")  # Wait for Settings
-            >>> wait_activity("com.example.app.MainActivity", 30)  # Wait 30 seconds
-            >>> wait_activity(".LoginActivity")  # Relative activity name
-
-        Note:
-            Activity names can be fully qualified (package + activity) or
-            relative to the app package starting with a dot (.).
-        """
-        try:
-            d = u2.connect(device_id)
-            return d.wait_activity(activity, timeout=timeout)
-        except Exception as e:
-            print(f"Failed to wait for activity {activity}: {str(e)}")
-            return False
+
+
+def _wait_activity(d, activity: str, timeout: float) -> bool:
+    """Wait for ``activity`` by following the activity manager's log.
+
+    One persistent-shell call reads the device clock and the focused window.
+    If the activity is not already in front, logcat is followed from that
+    moment on, so a launch between the check and the start of logcat is not
+    missed, and the wait ends on the log line rather than a polling tick.
+    Falls back to uiautomator2's ``dumpsys`` polling if logcat is unusable.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        output, _ = get_shell(d.serial).run(
+            "date '+%m-%d %H:%M:%S.000'; dumpsys window windows | grep mCurrentFocus"
+        )
+        since, _, focus = output.partition("\n")
+        m = FOCUS_RE.search(focus)
+        if m and _activity_matches(activity, m.group("package"), m.group("activity")):
+            return True
+        if not _DEVICE_TIME_RE.match(since):
+            raise RuntimeError(f"Unexpected device time: {since!r}")
+        proc = follow_logcat(d.serial, since, *_ACTIVITY_LOG_TAGS)
+    except Exception as e:
+        log.info("logcat unavailable for wait_activity, polling instead: %s", e)
+        return d.wait_activity(activity, timeout=timeout)
+
+    timer = threading.Timer(max(0.0, deadline - time.monotonic()), proc.kill)
+    timer.start()
+    try:
+        for line in proc.stdout:
+            m = _ACTIVITY_LOG_RE.search(line.decode("utf-8", "replace"))
+            if m and _activity_matches(activity, *m.groups()):
+                return True
+    finally:
+        timer.cancel()
+        proc.kill()
+        proc.wait()
+
+    # logcat exited before the timeout killed it
+    remaining = deadline - time.monotonic()
+    return remaining > 0 and d.wait_activity(activity, timeout=remaining)
+
+
+def _last_toast(d, timeout: float) -> str:
+    # The on-device server records the last toast itself, so polling it is a
+    # cheap read; poll more often than uiautomator2's fixed 0.5 s.
+    deadline = time.monotonic() + timeout
+    while True:
+        message = d.jsonrpc.getLastToast()
+        if message or time.monotonic() >= deadline:
+            return message or ""
+        time.sleep(TOAST_POLL_INTERVAL)
+
+
+def get_toast(timeout: float = 1.0, device_id: Optional[str] = None) -> str:
+    """Get the text content of the most recent toast message.
+
+    This function captures toast messages (temporary popup notifications) that
+    appear briefly on screen, which can be useful for verifying operations
+    or capturing system messages.
+
+    Args:
+        timeout: Maximum time in seconds to wait for a toast if none has
+            been shown yet (default: 1.0)
+        device_id: Optional device identifier. If not provided, uses the first available device
+
+    Returns:
+        str: The text content of the last toast message, or empty string if none found
+
+    Examples:
+        >>> get_toast()  # Get the last toast message
+        # Returns: "Download completed successfully"
+        >>> get_toast(timeout=10)  # Wait for a toast that is still coming
+
+    Note:
+        Toast messages are temporary and may disappear quickly.
+        Call this function promptly after the action that triggers the toast.
+        The device remembers the last toast, so a short timeout is enough
+        once the toast has appeared.
+    """
+    try:
+        return with_device(device_id, lambda d: _last_toast(d, timeout))
+    except Exception as e:
+        log.warning("Failed to get toast message: %s", e)
+        return ""
+
+
+def wait_activity(
+    activity: str, timeout: float = 10.0, device_id: Optional[str] = None
+) -> bool:
+    """Wait for a specific Android activity to become the current foreground activity.
+
+    This function monitors the device and waits until the specified activity
+    appears in the foreground, which is useful for verifying navigation
+    and app state transitions.
+
+    Args:
+        activity: The full activity name to wait for (e.g., "com.example.app.MainActivity")
+        timeout: Maximum time in seconds to wait (default: 10.0)
+        device_id: Optional device identifier. If not provided, uses the first available device
+
+    Returns:
+        bool: True if the activity appeared within the timeout, False otherwise
+
+    Examples:
+        >>> wait_activity("com.android.settings.Settings")  # Wait for Settings
+        >>> wait_activity("com.example.app.MainActivity", 30)  # Wait 30 seconds
+        >>> wait_activity(".LoginActivity")  # Relative activity name
+
+    Note:
+        Activity names can be fully qualified (package + activity) or
+        relative to the app package starting with a dot (.).
+    """
+    try:
+        return with_device(device_id, lambda d: _wait_activity(d, activity, timeout))
+    except Exception as e:
+        log.warning("Failed to wait for activity %s: %s", activity, e)
+        return False
+
+
+# (name, description, function) of every tool in this module
+_TOOLS = (
+    (
+        "get_toast",
+        "Retrieve the text of the last toast message displayed on the device. Useful for verifying notifications, error messages, and user feedback.",
+        get_toast,
+    ),
+    (
+        "wait_activity",
+        "Wait for a specific Android activity to appear on the screen. Useful for navigation verification and app state validation.",
+        wait_activity,
+    ),
+)
+
+
+def register_advanced_tools(mcp):
+    """Register all advanced tools with the MCP server."""
+    for name, description, fn in _TOOLS:
+        mcp.tool(name=name, description=description)(fn)
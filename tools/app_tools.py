@@ -1,6 +1,63 @@
-import uiautomator2 as u2
-from typing import Optional, Dict, Any
-import shutil
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+import shlex
+import time
+
+from ._adb import FOCUS_RE, get_adb_path, get_shell, list_packages
+from ._device import device_action, get_device, with_device
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Seconds a device's installed-app list is served from cache
+APPS_CACHE_TTL = 60.0
+
+# (serial, include_system) -> (monotonic timestamp, package list)
+_apps_cache: Dict[Tuple[str, bool], Tuple[float, List[str]]] = {}
+
+# The uiautomator2 server apps; stopping them would break the connection.
+_U2_PACKAGES = ["com.github.uiautomator", "com.github.uiautomator.test"]
+
+
+def _stop_all_command(keep: List[str]) -> str:
+    """Shell loop that force-stops every running third-party app not in ``keep``.
+
+    Without ``pidof`` on the device the loop cannot tell which apps are
+    running, so it force-stops every third-party app not in ``keep``.
+    """
+    skip = "|".join(shlex.quote(pkg) for pkg in _U2_PACKAGES + keep)
+    return (
+        "pkgs=$(pm list packages -3) || exit 1; "
+        "command -v pidof >/dev/null && check=pidof || check=true; "
+        'for pkg in $(echo "$pkgs" | sed "s/^package://"); do '
+        f"case $pkg in {skip}) continue;; esac; "
+        '$check "$pkg" >/dev/null && am force-stop "$pkg"; '
+        "done; exit 0"
+    )
+
+
+def _current_app(d) -> Dict[str, Any]:
+    """Return the focused app, filtering ``dumpsys`` output on the device.
+
+    ``d.app_current()`` transfers the whole ``dumpsys window windows`` output
+    over a fresh shell; grepping on the device over the persistent shell
+    sends back a single line. Falls back to ``d.app_current()`` when the
+    focused window cannot be determined that way.
+    """
+    try:
+        output, _ = get_shell(d.serial).run(
+            "dumpsys window windows | grep mCurrentFocus"
+        )
+        m = FOCUS_RE.search(output)
+        if m:
+            return {
+                "package": m.group("package"),
+                "activity": m.group("activity"),
+                "pid": 0,
+            }
+    except Exception as e:
+        log.info("Shell focus query failed, using app_current: %s", e)
+    return d.app_current()
 
 
 def register_app_tools(mcp):
@@ -10,7 +67,11 @@ def register_app_tools(mcp):
         name="get_installed_apps",
         description="Get a complete list of all installed applications on your Android device. Automatically connects to the first available device if no device_id is specified. Returns package names for all system and user-installed apps.",
     )
-    def get_installed_apps(device_id: Optional[str] = None) -> Dict[str, Any]:
+    def get_installed_apps(
+        device_id: Optional[str] = None,
+        refresh: bool = False,
+        include_system: bool = True,
+    ) -> Dict[str, Any]:
         """Retrieve a comprehensive list of all installed applications on the device.
 
         This function enumerates all applications installed on the Android device,
@@ -19,6 +80,9 @@ def register_app_tools(mcp):
 
         Args:
             device_id: Optional device identifier. If not provided, connects to the first available device.
+            refresh: Bypass the cached list and query the device again (default: False)
+            include_system: Include pre-installed system apps; False lists only
+                user-installed apps (default: True)
 
         Returns:
             Dictionary containing:
@@ -40,12 +104,15 @@ def register_app_tools(mcp):
         Note:
             - This may take several seconds on devices with many installed applications
             - Returns package names only, not detailed app information
-            - Includes both system apps and user-installed apps
+            - Includes both system apps and user-installed apps unless
+              include_system=False
             - Automatically validates device connection before proceeding
+            - Results are cached for 60 seconds per device; pass refresh=True after
+              installing or uninstalling apps
         """
         try:
             # Direct ADB check first
-            adb_path = shutil.which("adb")
+            adb_path = get_adb_path()
             if not adb_path:
                 return {
                     "success": False,
@@ -56,10 +123,19 @@ def register_app_tools(mcp):
                 }
 
             # Connect directly to device
-            d = u2.connect(device_id)
-
-            # Get installed apps
-            apps = d.app_list()
+            d = get_device(device_id)
+
+            # Get installed apps, reusing a recent listing when available
+            key = (d.serial, include_system)
+            cached = _apps_cache.get(key)
+            if not refresh and cached and time.monotonic() - cached[0] < APPS_CACHE_TTL:
+                apps = cached[1]
+            else:
+                try:
+                    apps = list_packages(d.serial, third_party=not include_system)
+                except Exception:
+                    apps = d.app_list(None if include_system else "-3")
+                _apps_cache[key] = (time.monotonic(), apps)
 
             return {
                 "success": True,
@@ -73,7 +149,7 @@ def register_app_tools(mcp):
                 "success": False,
                 "apps": [],
                 "count": 0,
-                "error": f"Failed to get installed apps: {str(e)}",
+                "error": f"Failed to get installed apps: {e}",
                 "device_id": device_id,
             }
 
@@ -97,16 +173,14 @@ def register_app_tools(mcp):
                 - pid: Process ID
                 - Other app metadata as provided by uiautomator2
         """
-        d = u2.connect(device_id)
-        return d.app_current()
+        return with_device(device_id, _current_app)
 
     @mcp.tool(
         name="start_app",
         description="Launch an Android application by its package name with optional wait for the app to appear in foreground",
     )
-    def start_app(
-        package_name: str, device_id: Optional[str] = None, wait: bool = True
-    ) -> bool:
+    @device_action
+    def start_app(d, package_name: str, wait: bool = True) -> bool:
         """Start an Android application using its package name.
 
         This function launches the specified app and optionally waits for it
@@ -125,22 +199,17 @@ def register_app_tools(mcp):
             >>> start_app("com.android.chrome")  # Launch Chrome and wait
             >>> start_app("com.example.app", wait=False)  # Launch immediately, don't wait
         """
-        try:
-            d = u2.connect(device_id)
-            d.app_start(package_name)
-            if wait:
-                pid = d.app_wait(package_name, front=True)
-                return pid is not None
-            return True
-        except Exception as e:
-            print(f"Failed to start app {package_name}: {str(e)}")
-            return False
+        d.app_start(package_name)
+        if wait:
+            pid = d.app_wait(package_name, front=True)
+            return pid is not None
 
     @mcp.tool(
         name="stop_app",
         description="Force stop an Android application by its package name. Useful for closing apps that are misbehaving or for testing app restart scenarios.",
     )
-    def stop_app(package_name: str, device_id: Optional[str] = None) -> bool:
+    @device_action
+    def stop_app(d, package_name: str) -> bool:
         """Stop a running Android application by its package name.
 
         This function force-stops the specified application, terminating all
@@ -157,25 +226,23 @@ def register_app_tools(mcp):
             This is equivalent to the "Force Stop" action in Android app settings.
             The app will need to be relaunched to be used again.
         """
-        try:
-            d = u2.connect(device_id)
-            d.app_stop(package_name)
-            return True
-        except Exception as e:
-            print(f"Failed to stop app {package_name}: {str(e)}")
-            return False
+        d.app_stop(package_name)
 
     @mcp.tool(
         name="stop_all_apps",
         description="Force stop all running applications on the device to free up memory and start with a clean slate for testing",
     )
-    def stop_all_apps(device_id: Optional[str] = None) -> bool:
+    @device_action
+    def stop_all_apps(d, keep: Optional[List[str]] = None) -> bool:
         """Stop all running applications on the Android device.
 
         This function terminates all user applications running on the device,
         which is useful for testing scenarios that require a clean state.
+        The apps are listed and stopped by a single loop on the device's
+        shell rather than one round-trip per app.
 
         Args:
+            keep: Optional package names to leave running
             device_id: Optional device identifier. If not provided, uses the first available device
 
         Returns:
@@ -185,19 +252,22 @@ def register_app_tools(mcp):
             This will not stop essential system services, only user applications.
             The device may take a few seconds to fully close all apps.
         """
+        keep = keep or []
         try:
-            d = u2.connect(device_id)
-            d.app_stop_all()
-            return True
+            _, exit_code = get_shell(d.serial).run(_stop_all_command(keep), 30.0)
+            if not exit_code:
+                return
+            log.info("Stop-all loop exited with %s, using app_stop_all", exit_code)
         except Exception as e:
-            print(f"Failed to stop all apps: {str(e)}")
-            return False
+            log.info("Stop-all loop failed, using app_stop_all: %s", e)
+        d.app_stop_all(excludes=keep)
 
     @mcp.tool(
         name="clear_app_data",
         description="Clear all data and cache for a specific app. This is equivalent to 'Clear Data' in Android app settings and will reset the app to its initial state.",
     )
-    def clear_app_data(package_name: str, device_id: Optional[str] = None) -> bool:
+    @device_action
+    def clear_app_data(d, package_name: str) -> bool:
         """Clear all user data and cache for the specified application.
 
         This function completely resets an app to its initial installed state,
@@ -215,10 +285,4 @@ def register_app_tools(mcp):
             login credentials, preferences, saved files, and databases.
             The app will behave as if freshly installed on next launch.
         """
-        try:
-            d = u2.connect(device_id)
-            d.app_clear(package_name)
-            return True
-        except Exception as e:
-            print(f"Failed to clear app data for {package_name}: {str(e)}")
-            return False
+        d.app_clear(package_name)
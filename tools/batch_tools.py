@@ -0,0 +1,232 @@
+from typing import Optional, Dict, Any, List
+import asyncio
+import inspect
+
+from fastmcp.utilities.types import get_cached_typeadapter
+
+from ._device import get_device, jsonrpc_batch
+from ._registry import TOOLS
+
+# Tools that dispatch to other tools; they cannot be nested in each other.
+_DISPATCHERS = {"batch_execute", "chain", "parallel_exec"}
+
+
+async def _run_action(
+    action: Dict[str, Any], device_id: Optional[str]
+) -> Dict[str, Any]:
+    name = action.get("tool", "")
+    args = dict(action.get("args") or {})
+    fn = TOOLS.get(name)
+    if fn is None or name in _DISPATCHERS:
+        return {"tool": name, "ok": False, "error": f"Unknown tool: {name}"}
+    if device_id is not None and "device_id" in inspect.signature(fn).parameters:
+        args.setdefault("device_id", device_id)
+    try:
+        # Validate and coerce the arguments against the tool's signature the
+        # way FastMCP does for a direct call, then call it
+        result = get_cached_typeadapter(fn).validate_python(args)
+        if inspect.isawaitable(result):
+            result = await result
+        return {"tool": name, "ok": True, "result": result}
+    except Exception as e:
+        return {"tool": name, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def _reported_failure(result: Any) -> Optional[str]:
+    """Return why a tool result reports failure, or None if it does not.
+
+    Action tools catch their own errors and return False; dictionary
+    results signal failure with ``success: False`` or an ``error`` message.
+    """
+    if result is False:
+        return "Tool returned False"
+    if isinstance(result, dict) and (
+        result.get("success") is False or result.get("error")
+    ):
+        return str(result.get("error") or "Tool reported failure")
+    return None
+
+
+async def _run_sequence(
+    actions: List[Dict[str, Any]],
+    device_id: Optional[str],
+    stop_on_error: bool,
+    check_results: bool = False,
+) -> List[Dict[str, Any]]:
+    results = []
+    for action in actions:
+        outcome = await _run_action(action, device_id)
+        if check_results and outcome["ok"]:
+            error = _reported_failure(outcome["result"])
+            if error is not None:
+                outcome = {**outcome, "ok": False, "error": error}
+        results.append(outcome)
+        if stop_on_error and not outcome["ok"]:
+            break
+    return results
+
+
+def register_batch_tools(mcp):
+    """Register tools that execute several other tools in a single call."""
+
+    @mcp.tool(
+        name="batch_execute",
+        description='Execute a sequence of tool calls in one request, e.g. filling a form with several click/send_text steps. Each action is {"tool": <tool name>, "args": {...}}. Much faster than calling the tools one by one.',
+    )
+    async def batch_execute(
+        actions: List[Dict[str, Any]],
+        stop_on_error: bool = True,
+        parallel: bool = False,
+        device_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run several tool calls server-side and return all of their results.
+
+        Actions run against the same pooled device connection, so a multi-step
+        interaction costs one round-trip from the agent instead of one per step.
+
+        Args:
+            actions: List of actions, each a dictionary with:
+                - tool: Name of the tool to call (e.g. "click", "send_text")
+                - args: Dictionary of arguments for that tool
+            stop_on_error: Stop at the first action that raises an error (default: True).
+                Ignored when parallel is True.
+            parallel: Run all actions concurrently. Only use for independent
+                actions whose order does not matter (default: False)
+            device_id: Optional device identifier applied to every action that
+                does not set its own. If not provided, uses the first available device
+
+        Returns:
+            List with one entry per executed action:
+                - tool: The tool name
+                - ok: False if the tool raised an error or does not exist
+                - result: The tool's return value (if ok)
+                - error: Error message (if not ok)
+
+        Examples:
+            >>> batch_execute([
+            ...     {"tool": "click", "args": {"selector": "Username"}},
+            ...     {"tool": "send_text", "args": {"text": "alice"}},
+            ...     {"tool": "click", "args": {"selector": "Login"}},
+            ... ])
+
+        Note:
+            A tool that reports failure through its return value (e.g. click
+            returning False) still counts as ok; check each result.
+        """
+        if parallel:
+            return list(
+                await asyncio.gather(*(_run_action(a, device_id) for a in actions))
+            )
+
+        return await _run_sequence(actions, device_id, stop_on_error)
+
+    @mcp.tool(
+        name="chain",
+        description='Perform a sequence of actions and observe the result in one request, e.g. click a field, type, press enter. Each action is {"tool": <tool name>, "args": {...}}; stops at the first action that errors or returns False and reports the foreground app afterwards.',
+    )
+    async def chain(
+        actions: List[Dict[str, Any]],
+        device_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Run actions in order, then report where they left the device.
+
+        Like ``batch_execute``, but meant as the primary way to drive an
+        interaction: it stops at the first failing action, including one
+        that reports failure through its result (such as click returning
+        False), and ends with an observation, so the agent does not need a
+        follow-up call to see which screen it landed on.
+
+        Args:
+            actions: List of actions, each a dictionary with:
+                - tool: Name of the tool to call (e.g. "click", "send_text")
+                - args: Dictionary of arguments for that tool
+            device_id: Optional device identifier applied to every action that
+                does not set its own. If not provided, uses the first available device
+
+        Returns:
+            Dictionary containing:
+                - results: One entry per executed action (see batch_execute);
+                  an action whose result reports failure (False, or a dictionary
+                  with success False or an error) is not ok and keeps its result
+                - current_app: get_current_app's answer after the last action,
+                  or None if it could not be read
+
+        Examples:
+            >>> chain([
+            ...     {"tool": "click", "args": {"selector": "Search"}},
+            ...     {"tool": "send_text", "args": {"text": "weather"}},
+            ...     {"tool": "press_key", "args": {"key": "enter"}},
+            ... ])
+        """
+        results = await _run_sequence(
+            actions, device_id, stop_on_error=True, check_results=True
+        )
+        observation = await _run_action({"tool": "get_current_app"}, device_id)
+        return {"results": results, "current_app": observation.get("result")}
+
+    @mcp.tool(
+        name="jsonrpc_batch",
+        description='Send raw uiautomator2 JSON-RPC calls to the device in a single request, e.g. [{"method": "click", "params": [540, 1200]}, {"method": "pressKey", "params": ["back"]}]. For advanced use; prefer batch_execute for normal tool sequences.',
+    )
+    def jsonrpc_batch_tool(
+        calls: List[Dict[str, Any]],
+        timeout: float = 10.0,
+        device_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Execute low-level uiautomator2 JSON-RPC methods in one device round-trip.
+
+        Args:
+            calls: List of calls, each a dictionary with:
+                - method: uiautomator2 JSON-RPC method name (e.g. "click", "pressKey")
+                - params: List of positional parameters (default: [])
+            timeout: HTTP timeout in seconds for the whole batch (default: 10.0)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            One entry per call, in order, with either "result" or "error"
+
+        Examples:
+            >>> jsonrpc_batch([
+            ...     {"method": "click", "params": [540, 1200]},
+            ...     {"method": "pressKey", "params": ["back"]},
+            ... ])
+        """
+        return jsonrpc_batch(get_device(device_id), calls, timeout)
+
+    @mcp.tool(
+        name="parallel_exec",
+        description="Run the same tool on several devices at once, e.g. install-and-launch checks across a device farm. Returns one result per device id.",
+    )
+    async def parallel_exec(
+        tool: str,
+        devices: List[str],
+        args: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Call one tool concurrently on every device in ``devices``.
+
+        Each device has its own pooled connection and concurrency limit, so
+        the calls overlap instead of waiting on each other.
+
+        Args:
+            tool: Name of the tool to call (e.g. "press_key", "get_device_info")
+            devices: Device identifiers to run the tool on; duplicates run once
+            args: Dictionary of arguments for the tool, without device_id
+
+        Returns:
+            Dictionary mapping each device id to an entry with:
+                - ok: False if the tool raised an error or does not exist
+                - result: The tool's return value (if ok)
+                - error: Error message (if not ok)
+
+        Examples:
+            >>> parallel_exec("press_key", ["emulator-5554", "emulator-5556"], {"key": "home"})
+        """
+        # A repeated id would run the action twice on that device
+        devices = list(dict.fromkeys(devices))
+        args = dict(args or {})
+        args.pop("device_id", None)
+        action = {"tool": tool, "args": args}
+        outcomes = await asyncio.gather(
+            *(_run_action(action, device) for device in devices)
+        )
+        return dict(zip(devices, outcomes))
@@ -1,29 +1,223 @@
-import uiautomator2 as u2
-from typing import Optional, Dict, Any
-import shutil
-import subprocess
+from typing import Optional, Dict, Any, Callable, List, Tuple
+import asyncio
+import re
+
+from ._adb import get_adb_path, get_shell, invalidate_adb_cache, ready_devices
+from ._device import (
+    clear_devices,
+    device_info,
+    set_fast_mode as set_device_fast_mode,
+    with_device,
+)
+from ._registry import offload
+from ._warmup import start_warmup
+
+
+# mcp_health's reply. The tool is async so a health poll answers on the event
+# loop instead of waiting for a worker thread.
+HEALTH_MESSAGE = "Hello, world! MCP Android Device Operator server is running."
+
+# Shape of every get_device_status response; copied and filled in per call
+_STATUS_TEMPLATE: Dict[str, Any] = {
+    "adb_available": False,
+    "connected_devices": [],
+    "device_connected": False,
+    "device_info": {},
+    "screen_on": False,
+    "error": None,
+    "ready_for_automation": False,
+}
+
+
+def _status(**fields: Any) -> Dict[str, Any]:
+    """Build a get_device_status response from the template."""
+    status = _STATUS_TEMPLATE.copy()
+    # Fresh containers so callers never share the template's list and dict
+    status["connected_devices"] = []
+    status["device_info"] = {}
+    status.update(fields)
+    return status
+
+
+def _device_failure(error: str, device_id: Optional[str]) -> Dict[str, Any]:
+    """Build the failure response shared by connect_device and get_device_info."""
+    return {"success": False, "device_info": {}, "error": error, "device_id": device_id}
+
+
+# Everything get_device_info reports, gathered in one shell round-trip.
+# Sections are separated by a marker line and parsed by _parse_device_info.
+_INFO_MARKER = "---MCP-SECTION---"
+_SEPARATOR = f"; echo {_INFO_MARKER}; "
+# Properties that never change while a device is connected; their output is
+# remembered per serial and only the other commands are re-run.
+_STATIC_COMMANDS = (
+    "getprop ro.build.version.release",
+    "getprop ro.build.version.sdk",
+    "getprop ro.product.manufacturer",
+    "getprop ro.product.model",
+    "getprop ro.product.name",
+)
+_INFO_DYNAMIC_COMMAND = _SEPARATOR.join(
+    (
+        "wm size",
+        "dumpsys battery",
+        "ip -o -4 addr show scope global",
+        "dumpsys power | grep mWakefulness=",
+    )
+)
+_INFO_COMMAND = _SEPARATOR.join((*_STATIC_COMMANDS, _INFO_DYNAMIC_COMMAND))
+# What get_device_status needs on top of the static properties
+_STATUS_DYNAMIC_COMMAND = "dumpsys power | grep mWakefulness="
+
+# serial -> output sections of _STATIC_COMMANDS
+_static_sections: Dict[str, List[str]] = {}
+_SIZE_RE = re.compile(r"(\d+)x(\d+)")
+# "3: wlan0    inet 192.168.1.23/24 brd ..." -> (interface, address)
+_INET_RE = re.compile(r"^\d+:\s+(\S+)\s+inet (\d+\.\d+\.\d+\.\d+)", re.M)
+# Interface name parts tried in order for wifi_ip (wlan0, swlan0, eth0 on
+# emulators); any other global address is used if none of them is up.
+_WIFI_INTERFACES = ("wlan", "eth")
+
+
+def _run_with_static(
+    serial: str, run: Callable[[str], str], dynamic_command: str
+) -> str:
+    """Run ``dynamic_command`` and return its output after the static sections.
+
+    The static properties are read along with it the first time per device
+    and remembered afterwards.
+    """
+    static = _static_sections.get(serial)
+    if static is not None:
+        return _INFO_MARKER.join((*static, run(dynamic_command)))
+    output = run(_SEPARATOR.join((*_STATIC_COMMANDS, dynamic_command)))
+    sections = output.split(_INFO_MARKER)
+    # A device that answered at all reports its Android release
+    if len(sections) > len(_STATIC_COMMANDS) and sections[0].strip():
+        _static_sections[serial] = sections[: len(_STATIC_COMMANDS)]
+    return output
+
+
+def _parse_device_info(output: str) -> Dict[str, Any]:
+    """Parse the output of ``_INFO_COMMAND`` into get_device_info fields."""
+    release, sdk, manufacturer, model, product, size, battery, inet, power = (
+        section.strip() for section in output.split(_INFO_MARKER)
+    )
+
+    # "Physical size: WxH", optionally followed by "Override size: WxH"
+    sizes = _SIZE_RE.findall(size)
+    width, height = sizes[-1] if sizes else ("0", "0")
+
+    # Every "key: value" line of dumpsys battery, with keys such as
+    # "AC powered" in snake case and values typed
+    battery_info: Dict[str, Any] = dict.fromkeys(
+        ("level", "status", "health", "temperature")
+    )
+    for line in battery.splitlines():
+        key, sep, value = line.partition(":")
+        value = value.strip()
+        if not sep or not value:
+            continue
+        if value.lstrip("-").isdigit():
+            value = int(value)
+        elif value in ("true", "false"):
+            value = value == "true"
+        battery_info[key.strip().lower().replace(" ", "_")] = value
+    if isinstance(battery_info["temperature"], int):
+        battery_info["temperature"] /= 10  # tenths of a degree Celsius
+
+    addresses = _INET_RE.findall(inet)
+    wifi_ip = next(
+        (
+            address
+            for part in _WIFI_INTERFACES
+            for name, address in addresses
+            if part in name
+        ),
+        addresses[0][1] if addresses else None,
+    )
+    return {
+        "resolution": f"{width}x{height}",
+        "version": release,
+        "sdk": int(sdk) if sdk.isdigit() else 0,
+        "battery": battery_info,
+        "wifi_ip": wifi_ip,
+        "manufacturer": manufacturer,
+        "model": model,
+        "is_screen_on": "mWakefulness=Awake" in power,
+        "product": product,
+    }
+
+
+def _probe_status(serial: str) -> Tuple[Dict[str, Any], bool]:
+    """Read the device summary and screen state over adb (blocking).
+
+    One command on the device's persistent shell, without connecting
+    uiautomator2.
+
+    Returns:
+        Tuple of (device_info, screen_on)
+
+    Raises:
+        RuntimeError: If the properties could not be read
+    """
+    output = _run_with_static(
+        serial,
+        lambda command: get_shell(serial).run(command)[0],
+        _STATUS_DYNAMIC_COMMAND,
+    )
+    sections = [section.strip() for section in output.split(_INFO_MARKER)]
+    if len(sections) != 6 or not sections[0]:
+        raise RuntimeError(f"Unexpected device probe output: {output!r}")
+    release, sdk, manufacturer, model, _, power = sections
+    device_info = {
+        "manufacturer": manufacturer,
+        "model": model,
+        "serial": serial,
+        "version": release,
+        "sdk": int(sdk) if sdk.isdigit() else 0,
+    }
+    return device_info, "mWakefulness=Awake" in power
+
+
+def _basic_device_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the device summary shared by get_device_status and connect_device."""
+    version = info.get("version") or {}
+    return {
+        "manufacturer": info.get("manufacturer", ""),
+        "model": info.get("model", ""),
+        "serial": info.get("serial", ""),
+        "version": version.get("release", ""),
+        "sdk": version.get("sdk", 0),
+    }
+
+
+def _read_info(device_id: Optional[str] = None):
+    """Return the cached device and its ``d.info`` (blocking)."""
+    return with_device(device_id, lambda d: (d, device_info(d)))
 
 
 def register_device_tools(mcp):
     """Register all device management related tools with the MCP server."""
+    start_warmup()
 
     @mcp.tool(
         name="mcp_health",
         description="Simple health check tool to verify MCP server is running",
     )
-    def mcp_health() -> str:
+    async def mcp_health() -> str:
         """Check if the MCP server is running and responsive.
 
         Returns:
             A greeting message confirming the server is operational
         """
-        return "Hello, world! MCP Android Device Operator server is running."
+        return HEALTH_MESSAGE
 
     @mcp.tool(
         name="get_device_status",
         description="Get complete device status including connection, ADB availability, and basic device info. This is the recommended first step to ensure everything is working before performing other operations.",
     )
-    def get_device_status() -> Dict[str, Any]:
+    async def get_device_status() -> Dict[str, Any]:
         """Get comprehensive device status and connectivity information.
 
         This tool performs a complete check of the Android device setup including:
@@ -36,61 +230,32 @@ def register_device_tools(mcp):
             Dictionary containing complete status information:
                 - adb_available: Boolean indicating if ADB is accessible
                 - connected_devices: List of available device IDs
-                - device_connected: Boolean indicating if device connection succeeded
+                - device_connected: Boolean indicating if the uiautomator2 connection succeeded
                 - device_info: Basic device information (if connected)
                 - screen_on: Boolean indicating if device screen is on
                 - error: Any error messages (if applicable)
-                - ready_for_automation: Boolean indicating if device is ready
+                - ready_for_automation: Boolean indicating if device is ready (uiautomator2 answers)
 
         This is the perfect starting point for any Android automation workflow.
         It will guide you through any connection issues and provide clear next steps.
         """
         try:
             # Check ADB availability directly
-            adb_path = shutil.which("adb")
+            adb_path = get_adb_path()
             if not adb_path:
-                return {
-                    "adb_available": False,
-                    "connected_devices": [],
-                    "device_connected": False,
-                    "device_info": {},
-                    "screen_on": False,
-                    "error": "ADB not available in PATH. Please install Android SDK platform-tools.",
-                    "ready_for_automation": False,
-                }
+                return _status(
+                    error="ADB not available in PATH. Please install Android SDK platform-tools."
+                )
 
             # Check for connected devices
             try:
-                result = subprocess.run(
-                    [adb_path, "devices"], capture_output=True, text=True, check=True
-                )
-                lines = result.stdout.strip().splitlines()
-                devices = []
-                for line in lines[1:]:
-                    if line.strip():
-                        parts = line.split()
-                        if len(parts) >= 2 and parts[1] == "device":
-                            devices.append(parts[0])
+                devices = await ready_devices()
             except Exception as e:
-                return {
-                    "adb_available": True,
-                    "connected_devices": [],
-                    "device_connected": False,
-                    "device_info": {},
-                    "screen_on": False,
-                    "error": f"Failed to check connected devices: {str(e)}",
-                    "ready_for_automation": False,
-                }
-
-            status = {
-                "adb_available": True,
-                "connected_devices": devices,
-                "device_connected": False,
-                "device_info": {},
-                "screen_on": False,
-                "error": None,
-                "ready_for_automation": False,
-            }
+                return _status(
+                    adb_available=True, error=f"Failed to check connected devices: {e}"
+                )
+
+            status = _status(adb_available=True, connected_devices=devices)
 
             if not devices:
                 status["error"] = (
@@ -98,45 +263,43 @@ def register_device_tools(mcp):
                 )
                 return status
 
-            # Try to connect and get basic info
-            try:
-                d = u2.connect()
-                info = d.info
-                device_info = {
-                    "manufacturer": info.get("manufacturer", ""),
-                    "model": info.get("model", ""),
-                    "serial": info.get("serial", ""),
-                    "version": info.get("version", {}).get("release", ""),
-                    "sdk": info.get("version", {}).get("sdk", 0),
-                }
-
+            # Basic info over adb and readiness over uiautomator2, both for
+            # the first device and run side by side
+            serial = devices[0]
+            probe, read = await asyncio.gather(
+                offload(_probe_status)(serial),
+                offload(_read_info)(serial),
+                return_exceptions=True,
+            )
+            info, screen_on = (
+                (None, None) if isinstance(probe, BaseException) else probe
+            )
+            if isinstance(read, BaseException):
+                u2_info = None
+                status["error"] = f"Device connection failed: {read}"
+            else:
+                u2_info = read[1]
                 status["device_connected"] = True
-                status["device_info"] = device_info
-
-                # Check screen state
-                status["screen_on"] = d.screen_on()
                 status["ready_for_automation"] = True
-
-            except Exception as e:
-                status["error"] = f"Device connection failed: {str(e)}"
+            if info is None and u2_info is not None:
+                info = _basic_device_info(u2_info)
+                # Screen state comes with the same info response
+                screen_on = bool(u2_info.get("screenOn", False))
+            if info is not None:
+                status["device_info"] = info
+                status["screen_on"] = screen_on
 
             return status
         except Exception as e:
-            return {
-                "adb_available": False,
-                "connected_devices": [],
-                "device_connected": False,
-                "device_info": {},
-                "screen_on": False,
-                "error": f"Status check failed: {str(e)}",
-                "ready_for_automation": False,
-            }
+            return _status(error=f"Status check failed: {e}")
 
     @mcp.tool(
         name="connect_device",
         description="Connect to an Android device using uiautomator2 and return comprehensive device information. If device_id is not provided, automatically connects to the first available device.",
     )
-    def connect_device(device_id: Optional[str] = None) -> Dict[str, Any]:
+    async def connect_device(
+        device_id: Optional[str] = None, verify_adb: bool = False
+    ) -> Dict[str, Any]:
         """Connect to an Android device and retrieve detailed device information.
 
         This function establishes a connection to an Android device using uiautomator2
@@ -145,6 +308,7 @@ def register_device_tools(mcp):
 
         Args:
             device_id: Optional device identifier (serial number). If not provided, connects to the first available device.
+            verify_adb: List connected devices via `adb devices` before connecting (default: False)
 
         Returns:
             Dictionary containing device details and connection status:
@@ -164,58 +328,38 @@ def register_device_tools(mcp):
 
         Note:
             - If no device_id is provided, connects to the first available device
-            - Automatically checks ADB availability
+            - Automatically checks ADB availability; pass verify_adb=True to also
+              confirm a device is listed by `adb devices` before connecting
             - Returns detailed success/failure information for debugging
         """
         try:
             # Check ADB availability directly (not calling MCP tool)
-            adb_path = shutil.which("adb")
+            adb_path = get_adb_path()
             if not adb_path:
-                return {
-                    "success": False,
-                    "device_info": {},
-                    "error": "ADB is not available in PATH",
-                    "device_id": device_id,
-                }
-
-            # Check for connected devices directly
-            try:
-                result = subprocess.run(
-                    [adb_path, "devices"], capture_output=True, text=True, check=True
-                )
-                lines = result.stdout.strip().splitlines()
-                devices = []
-                for line in lines[1:]:
-                    if line.strip():
-                        parts = line.split()
-                        if len(parts) >= 2 and parts[1] == "device":
-                            devices.append(parts[0])
-
-                if not devices:
-                    return {
-                        "success": False,
-                        "device_info": {},
-                        "error": "No Android devices connected. Please connect a device and ensure USB debugging is enabled.",
-                        "device_id": device_id,
-                    }
-            except Exception:
-                return {
-                    "success": False,
-                    "device_info": {},
-                    "error": "Failed to check connected devices via ADB",
-                    "device_id": device_id,
-                }
+                return _device_failure("ADB is not available in PATH", device_id)
+
+            # Optionally list devices first for a friendlier error message;
+            # connecting reports a missing device on its own.
+            if verify_adb:
+                try:
+                    devices = await ready_devices()
+
+                    if not devices:
+                        return _device_failure(
+                            "No Android devices connected. Please connect a device and ensure USB debugging is enabled.",
+                            device_id,
+                        )
+                except Exception:
+                    return _device_failure(
+                        "Failed to check connected devices via ADB", device_id
+                    )
 
             # Connect to device
-            d = u2.connect(device_id)
-            info = d.info
+            d, info = await offload(_read_info)(device_id=device_id)
+            display = info.get("display") or {}
             device_info = {
-                "manufacturer": info.get("manufacturer", ""),
-                "model": info.get("model", ""),
-                "serial": info.get("serial", ""),
-                "version": info.get("version", {}).get("release", ""),
-                "sdk": info.get("version", {}).get("sdk", 0),
-                "display": info.get("display", {}).get("density", ""),
+                **_basic_device_info(info),
+                "display": display.get("density", ""),
                 "product": info.get("productName", ""),
             }
 
@@ -226,12 +370,56 @@ def register_device_tools(mcp):
                 "device_id": d.serial or device_id,
             }
         except Exception as e:
-            return {
-                "success": False,
-                "device_info": {},
-                "error": f"Failed to connect to device: {str(e)}",
-                "device_id": device_id,
-            }
+            return _device_failure(f"Failed to connect to device: {e}", device_id)
+
+    @mcp.tool(
+        name="clear_device_cache",
+        description="Drop cached device connections so the next tool call reconnects. Use this if a device was rebooted or reconnected and tools keep failing.",
+    )
+    def clear_device_cache(device_id: Optional[str] = None) -> Dict[str, Any]:
+        """Forget cached uiautomator2 connections.
+
+        Args:
+            device_id: Optional device identifier. If not provided, all cached
+                connections are dropped.
+
+        Returns:
+            Dictionary containing:
+                - success: Always True
+                - cleared: Number of device connections dropped
+                - device_id: The device ID that was requested
+        """
+        return {
+            "success": True,
+            "cleared": clear_devices(device_id),
+            "device_id": device_id,
+        }
+
+    @mcp.tool(
+        name="set_fast_mode",
+        description="Turn uiautomator's wait-for-idle before every action off (fast, the default) or on. Turn it on if actions fire before an animated screen has settled.",
+    )
+    def set_fast_mode(enabled: bool = True) -> Dict[str, Any]:
+        """Switch between fast and default UiAutomator timing.
+
+        In fast mode the on-device server does not wait for the UI to go idle
+        before each lookup or action. Applies to every connected device and
+        to devices connected later.
+
+        Args:
+            enabled: True for fast mode, False for UiAutomator's default waits
+
+        Returns:
+            Dictionary containing:
+                - success: Always True
+                - fast_mode: The mode now in effect
+                - devices: Number of connected devices that were reconfigured
+        """
+        return {
+            "success": True,
+            "fast_mode": enabled,
+            "devices": set_device_fast_mode(enabled),
+        }
 
     @mcp.tool(
         name="get_device_info",
@@ -258,8 +446,10 @@ def register_device_tools(mcp):
                 - resolution: Screen resolution as "WIDTHxHEIGHT" string
                 - version: Android version number
                 - sdk: Android SDK level
-                - battery: Battery information dictionary (level, health, status)
-                - wifi_ip: Device's WiFi IP address
+                - battery: Every field of ``dumpsys battery`` (level, status, health,
+                  temperature in degrees Celsius, voltage, ac_powered, usb_powered, ...)
+                - wifi_ip: Device's WiFi IP address (or its first global IPv4 address
+                  when no wlan/eth interface has one)
                 - manufacturer: Device manufacturer
                 - model: Device model name
                 - is_screen_on: Boolean indicating if screen is currently on
@@ -269,22 +459,18 @@ def register_device_tools(mcp):
             Returns error information if unable to retrieve device information.
         """
         try:
-            d = u2.connect(device_id)
-            info = d.info
-            display = d.window_size()
-
-            device_info = {
-                "serial": d.serial,
-                "resolution": f"{display[0]}x{display[1]}",
-                "version": info.get("version", {}).get("release", ""),
-                "sdk": info.get("version", {}).get("sdk", 0),
-                "battery": d.battery_info,
-                "wifi_ip": d.wlan_ip,
-                "manufacturer": info.get("manufacturer", ""),
-                "model": info.get("model", ""),
-                "is_screen_on": d.screen_on(),
-                "product": info.get("productName", ""),
-            }
+            d, output = with_device(
+                device_id,
+                lambda d: (
+                    d,
+                    _run_with_static(
+                        d.serial,
+                        lambda command: d.shell(command).output,
+                        _INFO_DYNAMIC_COMMAND,
+                    ),
+                ),
+            )
+            device_info = {"serial": d.serial, **_parse_device_info(output)}
 
             return {
                 "success": True,
@@ -293,18 +479,13 @@ def register_device_tools(mcp):
                 "device_id": d.serial or device_id,
             }
         except Exception as e:
-            return {
-                "success": False,
-                "device_info": {},
-                "error": f"Failed to get device info: {str(e)}",
-                "device_id": device_id,
-            }
+            return _device_failure(f"Failed to get device info: {e}", device_id)
 
     @mcp.tool(
         name="check_adb_and_list_devices",
         description="Check if ADB (Android Debug Bridge) is available in the system PATH and list all connected Android devices with their status",
     )
-    def check_adb_and_list_devices() -> Dict[str, Any]:
+    async def check_adb_and_list_devices() -> Dict[str, Any]:
         """Verify ADB availability and enumerate connected Android devices.
 
         This utility function checks if ADB is properly installed and accessible,
@@ -319,7 +500,7 @@ def register_device_tools(mcp):
         The devices list only includes devices with "device" status (ready for commands).
         Devices in "unauthorized" or other states are excluded.
         """
-        adb_path = shutil.which("adb")
+        adb_path = get_adb_path()
         if not adb_path:
             return {
                 "adb_exists": False,
@@ -327,16 +508,26 @@ def register_device_tools(mcp):
                 "error": "adb command not found in PATH",
             }
         try:
-            result = subprocess.run(
-                [adb_path, "devices"], capture_output=True, text=True, check=True
-            )
-            lines = result.stdout.strip().splitlines()
-            devices = []
-            for line in lines[1:]:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 2 and parts[1] == "device":
-                        devices.append(parts[0])
+            devices = await ready_devices()
             return {"adb_exists": True, "devices": devices, "error": None}
         except Exception as e:
             return {"adb_exists": True, "devices": [], "error": str(e)}
+
+    @mcp.tool(
+        name="refresh_adb_path",
+        description="Look up the adb executable in PATH again, e.g. after installing or moving Android SDK platform-tools while the server is running",
+    )
+    def refresh_adb_path() -> Dict[str, Any]:
+        """Forget the cached adb location and device list and resolve adb again.
+
+        The adb path is looked up once and reused; a missing adb is looked up
+        again automatically, but a moved or replaced one is not.
+
+        Returns:
+            Dictionary containing:
+                - adb_exists: Boolean indicating if ADB command is found in PATH
+                - adb_path: Path of the adb executable, or None
+        """
+        invalidate_adb_cache()
+        adb_path = get_adb_path()
+        return {"adb_exists": adb_path is not None, "adb_path": adb_path}
@@ -1,5 +1,39 @@
-import uiautomator2 as u2
-from typing import Optional
+import logging
+from typing import List, Optional, Tuple
+
+from ._device import device_action, get_device
+from ._selectors import center, element_info, find, forget_elements
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+def _click_element(d, selector: str, selector_type: str, timeout: float) -> bool:
+    info = element_info(d, selector, selector_type, timeout, cached=False)
+    if info is None:
+        return False
+    d.click(*center(info))
+    return True
+
+
+def _eased_points(
+    start_x: float, start_y: float, end_x: float, end_y: float, duration: float
+) -> List[Tuple[int, int]]:
+    """Points along a swipe with cubic ease-in-out (smoothstep) spacing.
+
+    About 60 points per second of swipe, between 3 and 40. Coordinates are
+    pixels and points are rounded to whole pixels; fractions of the screen
+    must be converted with ``d.pos_rel2abs`` first.
+    """
+    steps = max(3, min(40, int(duration * 60)))
+    points = []
+    for i in range(steps):
+        t = i / (steps - 1)
+        eased = t * t * (3 - 2 * t)
+        x = start_x + (end_x - start_x) * eased
+        y = start_y + (end_y - start_y) * eased
+        points.append((round(x), round(y)))
+    return points
 
 
 def register_input_tools(mcp):
@@ -9,7 +43,8 @@ def register_input_tools(mcp):
         name="press_key",
         description="Press a hardware or software key on the device. Common keys include: home, back, menu, volume_up, volume_down, power, enter, delete",
     )
-    def press_key(key: str, device_id: Optional[str] = None) -> bool:
+    @device_action
+    def press_key(d, key: str) -> bool:
         """Simulate pressing a key on the Android device.
 
         This function sends a key event to the device, simulating both hardware
@@ -33,23 +68,18 @@ def register_input_tools(mcp):
             >>> press_key("home")  # Press home button
             >>> press_key("back")  # Go back
         """
-        try:
-            d = u2.connect(device_id)
-            d.press(key)
-            return True
-        except Exception as e:
-            print(f"Failed to press key {key}: {str(e)}")
-            return False
+        d.press(key)
 
     @mcp.tool(
         name="click",
         description="Click on a UI element identified by text, resource ID, or content description. Supports multiple selector types for flexible element targeting.",
     )
+    @device_action
     def click(
+        d,
         selector: str,
         selector_type: str = "text",
         timeout: float = 10.0,
-        device_id: Optional[str] = None,
     ) -> bool:
         """Click on a UI element on the device screen using various selector types.
 
@@ -76,34 +106,40 @@ def register_input_tools(mcp):
         Raises:
             ValueError: If an invalid selector_type is provided
         """
-        try:
-            d = u2.connect(device_id)
-            if selector_type == "text":
-                el = d(text=selector).wait(timeout=timeout)
-            elif selector_type == "resourceId":
-                el = d(resourceId=selector).wait(timeout=timeout)
-            elif selector_type == "description":
-                el = d(description=selector).wait(timeout=timeout)
-            else:
-                raise ValueError(f"Invalid selector_type: {selector_type}")
-
-            if el and el.exists:
-                el.click()
-                return True
-            return False
-        except Exception as e:
-            print(f"Failed to click element {selector}: {str(e)}")
-            return False
+        return _click_element(d, selector, selector_type, timeout)
+
+    @mcp.tool(
+        name="click_at",
+        description="Tap at screen coordinates, e.g. the cx/cy returned by get_element_info. The fastest way to click when the position is already known, as no element lookup is done.",
+    )
+    @device_action
+    def click_at(d, x: float, y: float) -> bool:
+        """Tap the screen at the given coordinates.
+
+        Args:
+            x: X coordinate in pixels (or a fraction of the width below 1)
+            y: Y coordinate in pixels (or a fraction of the height below 1)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            bool: True if the tap was sent successfully, False otherwise
+
+        Examples:
+            >>> click_at(540, 1200)  # Tap a known position
+            >>> click_at(0.5, 0.5)  # Tap the middle of the screen
+        """
+        d.click(x, y)
 
     @mcp.tool(
         name="long_click",
         description="Perform a long click (press and hold) on a UI element. Useful for context menus, drag operations, or long press actions.",
     )
+    @device_action
     def long_click(
+        d,
         selector: str,
         selector_type: str = "text",
         duration: float = 1.0,
-        device_id: Optional[str] = None,
     ) -> bool:
         """Perform a long click gesture on a UI element.
 
@@ -123,36 +159,25 @@ def register_input_tools(mcp):
             >>> long_click("Item", "text", 2.0)  # Long click for 2 seconds
             >>> long_click("com.app:id/draggable", "resourceId")  # Long click by ID
         """
-        try:
-            d = u2.connect(device_id)
-            if selector_type == "text":
-                el = d(text=selector)
-            elif selector_type == "resourceId":
-                el = d(resourceId=selector)
-            elif selector_type == "description":
-                el = d(description=selector)
-            else:
-                raise ValueError(f"Invalid selector_type: {selector_type}")
-
-            if el and el.exists:
-                el.long_click(duration=duration)
-                return True
-            return False
-        except Exception as e:
-            print(f"Failed to long click element {selector}: {str(e)}")
+        # timeout=0 checks for the element once instead of waiting
+        info = element_info(d, selector, selector_type, 0, cached=False)
+        if info is None:
             return False
+        d.long_click(*center(info), duration)
 
     @mcp.tool(
         name="swipe",
         description="Perform a swipe gesture from one coordinate to another. Useful for scrolling, paging, or custom swipe actions.",
     )
+    @device_action
     def swipe(
+        d,
         start_x: float,
         start_y: float,
         end_x: float,
         end_y: float,
         duration: float = 0.5,
-        device_id: Optional[str] = None,
+        easing: str = "linear",
     ) -> bool:
         """Perform a swipe gesture on the device screen.
 
@@ -165,6 +190,9 @@ def register_input_tools(mcp):
             end_x: Ending X coordinate
             end_y: Ending Y coordinate
             duration: Swipe duration in seconds (default: 0.5)
+            easing: "linear" moves at constant speed; "cubic" accelerates and
+                decelerates like a finger, which some scroll and fling detectors
+                need to register the gesture (default: "linear")
             device_id: Optional device identifier. If not provided, uses the first available device
 
         Returns:
@@ -172,6 +200,7 @@ def register_input_tools(mcp):
 
         Examples:
             >>> swipe(100, 500, 100, 100)  # Swipe up
+            >>> swipe(100, 500, 100, 100, easing="cubic")  # Swipe up with a natural stroke
             >>> swipe(100, 100, 500, 100, 0.3)  # Swipe right quickly
             >>> swipe(300, 400, 300, 1000, 1.0)  # Slow swipe down
 
@@ -179,24 +208,56 @@ def register_input_tools(mcp):
             Coordinates are relative to the device screen resolution.
             Use (0, 0) for top-left corner.
         """
-        try:
-            d = u2.connect(device_id)
+        if easing == "linear":
             d.swipe(start_x, start_y, end_x, end_y, duration=duration)
-            return True
-        except Exception as e:
-            print(f"Failed to perform swipe: {str(e)}")
-            return False
+        elif easing == "cubic":
+            # Values below 1 are fractions of the screen, decided per
+            # coordinate as d.swipe does
+            rel2abs = d.pos_rel2abs
+            points = _eased_points(
+                *rel2abs(start_x, start_y), *rel2abs(end_x, end_y), duration
+            )
+            # swipe_points takes the duration of each segment
+            d.swipe_points(points, duration / (len(points) - 1))
+        else:
+            raise ValueError(f"Unknown easing: {easing}")
+
+    @mcp.tool(
+        name="swipe_direction",
+        description="Swipe across the screen in a direction (up, down, left, right) without computing coordinates. Use for scrolling lists and paging.",
+    )
+    @device_action
+    def swipe_direction(d, direction: str, scale: float = 0.8) -> bool:
+        """Swipe from the middle of the screen in one direction.
+
+        Covers the common scrolling case without the caller having to know
+        the screen resolution; use swipe() for explicit coordinates.
+
+        Args:
+            direction: One of 'up', 'down', 'left' or 'right' (finger movement)
+            scale: Fraction of the screen the swipe covers (default: 0.8)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            bool: True if the swipe was performed successfully, False otherwise
+
+        Examples:
+            >>> swipe_direction("up")  # Scroll a list down
+            >>> swipe_direction("left", 0.5)  # Page to the next screen
+        """
+        d.swipe_ext(direction, scale=scale)
 
     @mcp.tool(
         name="drag",
         description="Drag a specific UI element to a target location on the screen. Useful for drag-and-drop operations, reordering items, or custom interactions.",
     )
+    @device_action
     def drag(
+        d,
         selector: str,
         selector_type: str,
         to_x: int,
         to_y: int,
-        device_id: Optional[str] = None,
     ) -> bool:
         """Drag a UI element to a specific location on the screen.
 
@@ -217,32 +278,19 @@ def register_input_tools(mcp):
             >>> drag("Item", "text", 200, 300)  # Drag text "Item" to coordinates (200, 300)
             >>> drag("com.app:id/card", "resourceId", 100, 100)  # Drag by resource ID
         """
+        from uiautomator2.exceptions import UiObjectNotFoundError
+
         try:
-            d = u2.connect(device_id)
-            if selector_type == "text":
-                el = d(text=selector)
-            elif selector_type == "resourceId":
-                el = d(resourceId=selector)
-            elif selector_type == "description":
-                el = d(description=selector)
-            else:
-                raise ValueError(f"Invalid selector_type: {selector_type}")
-
-            if el and el.exists:
-                el.drag_to(to_x, to_y)
-                return True
-            return False
-        except Exception as e:
-            print(f"Failed to drag element {selector}: {str(e)}")
+            find(d, selector, selector_type).drag_to(to_x, to_y, timeout=0)
+        except UiObjectNotFoundError:
             return False
 
     @mcp.tool(
         name="send_text",
         description="Send text input to the currently focused UI element. Can optionally clear existing text before sending. Perfect for form filling, search boxes, and text fields.",
     )
-    def send_text(
-        text: str, clear: bool = True, device_id: Optional[str] = None
-    ) -> bool:
+    @device_action
+    def send_text(d, text: str, clear: bool = True) -> bool:
         """Send text to the currently focused input element on the device.
 
         This function types text into whatever UI element currently has focus,
@@ -265,10 +313,55 @@ def register_input_tools(mcp):
             Make sure the target text field is focused before calling this function.
             Use click() to focus a text field if needed.
         """
+        d.send_keys(text, clear=clear)
+
+    @mcp.tool(
+        name="click_many",
+        description="Click several UI elements in order in a single call, e.g. a sequence of menu entries or list rows. Returns one result per selector.",
+    )
+    def click_many(
+        selectors: List[str],
+        selector_type: str = "text",
+        timeout: float = 10.0,
+        stop_on_failure: bool = True,
+        device_id: Optional[str] = None,
+    ) -> List[bool]:
+        """Click a list of UI elements one after another.
+
+        All clicks run against one device connection in a single tool call,
+        instead of one MCP round-trip per element.
+
+        Args:
+            selectors: Values to search for, clicked in order
+            selector_type: The type of selector ('text', 'resourceId', or 'description')
+            timeout: Maximum time in seconds to wait for each element (default: 10.0)
+            stop_on_failure: Stop at the first element that could not be clicked (default: True)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            List[bool]: One entry per attempted click, True if it succeeded
+
+        Examples:
+            >>> click_many(["Settings", "Display", "Dark theme"])  # Navigate a menu
+        """
+        results: List[bool] = []
         try:
-            d = u2.connect(device_id)
-            d.send_keys(text, clear=clear)
-            return True
+            # Not retried through with_device: a reconnect would replay clicks
+            # that already happened
+            d = get_device(device_id)
         except Exception as e:
-            print(f"Failed to send text: {str(e)}")
-            return False
+            log.warning("Failed to connect for click_many: %s", e)
+            return results
+
+        for selector in selectors:
+            try:
+                clicked = _click_element(d, selector, selector_type, timeout)
+            except Exception as e:
+                log.warning("Failed to click element %s: %s", selector, e)
+                clicked = False
+            # The click may have changed the screen
+            forget_elements()
+            results.append(clicked)
+            if stop_on_failure and not clicked:
+                break
+        return results
@@ -1,9 +1,28 @@
-import uiautomator2 as u2
-from typing import Optional, TypedDict, Dict, Any
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Union
+import base64
+import copy
+import functools
+import hashlib
+import io
+import logging
+import re
 
+from ._device import jsonrpc_batch, with_device
+from ._selectors import cached_element, center, element_info, find, selector_kwargs
+from ._u2compat import InternalsUnavailable, shell_bytes, warn_fallback
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# serial -> SHA-256 of the last screenshot written for that device
+_screenshot_digests: Dict[str, bytes] = {}
+
+
+@dataclass(slots=True, frozen=True)
+class ElementInfo:
+    """Properties of a UI element, built from uiautomator2's ``el.info``."""
 
-# Type definitions for element info
-class ElementInfo(TypedDict):
     text: str
     resourceId: str
     description: str
@@ -13,6 +32,280 @@ class ElementInfo(TypedDict):
     bounds: Dict[str, Any]
     selected: bool
     focused: bool
+    # Tap point for click_at, as uiautomator2's own element clicks compute it
+    cx: Optional[int]
+    cy: Optional[int]
+
+    @classmethod
+    def from_info(cls, info: Dict[str, Any]) -> "ElementInfo":
+        if info.get("visibleBounds") or info.get("bounds"):
+            cx, cy = (int(v) for v in center(info))
+        else:
+            cx = cy = None
+        return cls(
+            text=info.get("text", ""),
+            resourceId=info.get("resourceId", ""),
+            description=info.get("contentDescription", ""),
+            className=info.get("className", ""),
+            enabled=info.get("enabled", False),
+            clickable=info.get("clickable", False),
+            bounds=info.get("bounds", {}),
+            selected=info.get("selected", False),
+            focused=info.get("focused", False),
+            cx=cx,
+            cy=cy,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "resourceId": self.resourceId,
+            "description": self.description,
+            "className": self.className,
+            "enabled": self.enabled,
+            "clickable": self.clickable,
+            "bounds": self.bounds,
+            "selected": self.selected,
+            "focused": self.focused,
+            "cx": self.cx,
+            "cy": self.cy,
+        }
+
+
+_BOUNDS_RE = re.compile(r"-?\d+")
+
+
+def _save_screenshot(
+    d,
+    filename: str,
+    skip_unchanged: bool = False,
+    quality: int = 80,
+    scale: float = 1.0,
+) -> bool:
+    """Write a screenshot to ``filename`` without re-encoding it when possible.
+
+    ``d.screenshot(filename)`` decodes the JPEG sent by the uiautomator
+    server with Pillow and encodes it again for the target format. For
+    ``.jpg`` files that JPEG is written as-is, scaled and compressed to
+    ``quality`` on the device before transfer. For full-size ``.png`` files
+    the PNG produced by the device's ``screencap`` is written. Other formats
+    and scaled PNGs still go through Pillow, which decodes the capture at
+    reduced size where it can.
+
+    With ``skip_unchanged``, a JPEG or PNG capture identical to the last one
+    written for the device is not written again.
+
+    Returns:
+        False if the write was skipped because the screen was unchanged
+    """
+    if not 0 < scale <= 1:
+        raise ValueError(f"scale must be in (0, 1], got {scale}")
+    if not 1 <= quality <= 100:
+        raise ValueError(f"quality must be between 1 and 100, got {quality}")
+
+    name = filename.lower()
+    if name.endswith((".jpg", ".jpeg")):
+        data = d.jsonrpc.takeScreenshot(scale, quality)
+        image = base64.b64decode(data) if data else None
+    elif name.endswith(".png") and scale == 1:
+        try:
+            image = shell_bytes(d, "screencap -p")
+        except InternalsUnavailable as e:
+            warn_fallback("screenshot", e)
+            image = None
+        else:
+            if not image.startswith(b"\x89PNG"):
+                warn_fallback("screenshot", "screencap did not return a PNG")
+                image = None
+    else:
+        image = None
+
+    if image is None:
+        if scale == 1:
+            d.screenshot(filename)
+        else:
+            from PIL import Image
+
+            picture = d.screenshot()
+            size = (round(picture.width * scale), round(picture.height * scale))
+            # Let the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding,
+            # so the full-resolution bitmap is never allocated
+            picture.draft("RGB", size)
+            picture.resize(size, Image.LANCZOS).save(filename, quality=quality)
+        _screenshot_digests.pop(d.serial, None)
+        return True
+    digest = hashlib.sha256(image).digest()
+    if skip_unchanged and _screenshot_digests.get(d.serial) == digest:
+        return False
+    with open(filename, "wb") as f:
+        f.write(image)
+    _screenshot_digests[d.serial] = digest
+    return True
+
+
+def _ui_snapshot(
+    d,
+    include_xml: bool,
+    include_focused: bool,
+    screenshot_file: Optional[str],
+    compressed: bool,
+    max_depth: int,
+) -> Dict[str, Any]:
+    """Read hierarchy, focused element and screenshot in one JSON-RPC batch.
+
+    Each part that is not requested, or whose call fails, is None.
+    """
+    parts = []
+    if include_xml:
+        parts.append(("hierarchy", "dumpWindowHierarchy", [compressed, max_depth]))
+    if include_focused:
+        parts.append(("focused", "objInfo", [d(focused=True).selector]))
+    if screenshot_file:
+        parts.append(("screenshot", "takeScreenshot", [1, 80]))
+
+    snapshot: Dict[str, Any] = {"hierarchy": None, "focused": None, "screenshot": None}
+    responses = jsonrpc_batch(d, [{"method": m, "params": p} for _, m, p in parts])
+    for (key, _, _), response in zip(parts, responses):
+        result = response.get("result")
+        if result is None:
+            continue
+        if key == "focused":
+            result = ElementInfo.from_info(result).to_dict()
+        elif key == "screenshot":
+            with open(screenshot_file, "wb") as f:
+                f.write(base64.b64decode(result))
+            result = screenshot_file
+        snapshot[key] = result
+    return snapshot
+
+
+def _filter_hierarchy(xml: str, class_name: str, pretty: bool) -> str:
+    """Keep only the subtrees rooted at nodes whose class is ``class_name``.
+
+    The dump is streamed with iterparse and every element outside a match is
+    cleared as soon as it ends, so the full tree is never built.
+    """
+    from lxml import etree
+
+    root = None
+    match = None
+    for event, el in etree.iterparse(
+        io.BytesIO(xml.encode("utf-8")), events=("start", "end")
+    ):
+        if root is None:
+            root = etree.Element(el.tag, dict(el.attrib))
+        elif event == "start":
+            if match is None and el.get("class") == class_name:
+                match = el
+        elif el is match:
+            node = copy.deepcopy(el)
+            node.tail = None
+            root.append(node)
+            el.clear()
+            match = None
+        elif match is None:
+            el.clear()
+    return etree.tostring(root, encoding="unicode", pretty_print=pretty)
+
+
+@functools.lru_cache(maxsize=64)
+def _compiled_xpath(expression: str):
+    """Compile an XPath expression once; agents repeat the same queries."""
+    from lxml import etree
+
+    return etree.XPath(expression)
+
+
+def _find_xpaths(xml: str, xpaths: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    """Run several XPath queries against one parse of a hierarchy dump.
+
+    Returns:
+        The attributes of every element each expression selects, by expression
+    """
+    from lxml import etree
+
+    tree = etree.fromstring(xml.encode("utf-8"))
+    return {
+        xpath: [
+            dict(el.attrib)
+            for el in _compiled_xpath(xpath)(tree)
+            if isinstance(el, etree._Element)
+        ]
+        for xpath in xpaths
+    }
+
+
+def _xpath_hierarchy(xml: str, xpath: str, pretty: bool) -> str:
+    """Keep only the elements selected by ``xpath``, with their subtrees.
+
+    XPath predicates may look at ancestors and descendants, so this needs the
+    whole tree; lxml builds and queries it in C.
+    """
+    from lxml import etree
+
+    tree = etree.fromstring(xml.encode("utf-8"))
+    root = etree.Element(tree.tag, dict(tree.attrib))
+    for el in _compiled_xpath(xpath)(tree):
+        if isinstance(el, etree._Element):
+            node = copy.deepcopy(el)
+            node.tail = None
+            root.append(node)
+    return etree.tostring(root, encoding="unicode", pretty_print=pretty)
+
+
+def _compact_hierarchy(xml: str) -> Dict[str, Any]:
+    """Convert a UIAutomator XML dump into a compact column-oriented structure.
+
+    Class names and resource IDs are interned into lookup tables and
+    referenced by index, and bounds are flattened into one integer list,
+    which is far smaller than the attribute-heavy XML.
+    """
+    # Imported here so lxml is only loaded once a compact dump is requested
+    from lxml import etree
+
+    classes: list = []
+    class_index: Dict[str, int] = {}
+    resource_ids: list = []
+    resource_id_index: Dict[str, int] = {}
+    nodes: Dict[str, list] = {
+        "class_idx": [],
+        "resource_id_idx": [],
+        "parent": [],
+        "text": [],
+        "description": [],
+        "clickable": [],
+        "bounds": [],
+    }
+
+    stack: list = []
+    for event, el in etree.iterparse(
+        io.BytesIO(xml.encode("utf-8")), events=("start", "end"), tag="node"
+    ):
+        if event == "end":
+            stack.pop()
+            el.clear()
+            continue
+
+        class_name = el.get("class", "")
+        if class_name not in class_index:
+            class_index[class_name] = len(classes)
+            classes.append(class_name)
+        resource_id = el.get("resource-id", "")
+        if resource_id and resource_id not in resource_id_index:
+            resource_id_index[resource_id] = len(resource_ids)
+            resource_ids.append(resource_id)
+
+        nodes["class_idx"].append(class_index[class_name])
+        nodes["resource_id_idx"].append(resource_id_index.get(resource_id, -1))
+        nodes["parent"].append(stack[-1] if stack else -1)
+        nodes["text"].append(el.get("text", ""))
+        nodes["description"].append(el.get("content-desc", ""))
+        nodes["clickable"].append(el.get("clickable") == "true")
+        coords = [int(n) for n in _BOUNDS_RE.findall(el.get("bounds", ""))]
+        nodes["bounds"].extend(coords if len(coords) == 4 else (0, 0, 0, 0))
+        stack.append(len(nodes["parent"]) - 1)
+
+    return {"classes": classes, "resource_ids": resource_ids, **nodes}
 
 
 def register_inspection_tools(mcp):
@@ -20,14 +313,15 @@ def register_inspection_tools(mcp):
 
     @mcp.tool(
         name="get_element_info",
-        description="Get detailed information about a UI element including its properties, bounds, text, resource ID, class name, and interaction capabilities.",
+        description='Get detailed information about a UI element including its properties, bounds, text, resource ID, class name, and interaction capabilities. Pass attributes (e.g. ["bounds"]) to return only the properties you need.',
     )
     def get_element_info(
         selector: str,
         selector_type: str = "text",
         timeout: float = 10.0,
         device_id: Optional[str] = None,
-    ) -> ElementInfo:
+        attributes: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
         """Retrieve detailed information about a UI element.
 
         This function finds an element and returns comprehensive information about
@@ -38,9 +332,11 @@ def register_inspection_tools(mcp):
             selector_type: The type of selector ('text', 'resourceId', or 'description')
             timeout: Maximum time in seconds to wait for the element (default: 10.0)
             device_id: Optional device identifier. If not provided, uses the first available device
+            attributes: Optional names of the properties to return (e.g. ["bounds", "text"]).
+                If not provided, all properties are returned
 
         Returns:
-            ElementInfo dictionary containing:
+            Dictionary (see ElementInfo) containing:
                 - text: Visible text on the element
                 - resourceId: Android resource ID
                 - description: Content description/accessibility label
@@ -50,36 +346,24 @@ def register_inspection_tools(mcp):
                 - bounds: Element position and size {"left": x, "top": y, "right": x2, "bottom": y2}
                 - selected: Whether the element is selected
                 - focused: Whether the element has focus
+                - cx, cy: Center of the element, ready to pass to click_at
 
             Returns empty dictionary if element not found.
         """
+
+        def _element_info(d) -> Dict[str, Any]:
+            info = element_info(d, selector, selector_type, timeout)
+            if not info:
+                return {}
+            properties = ElementInfo.from_info(info).to_dict()
+            if attributes is None:
+                return properties
+            return {name: properties[name] for name in attributes if name in properties}
+
         try:
-            d = u2.connect(device_id)
-            if selector_type == "text":
-                el = d(text=selector).wait(timeout=timeout)
-            elif selector_type == "resourceId":
-                el = d(resourceId=selector).wait(timeout=timeout)
-            elif selector_type == "description":
-                el = d(description=selector).wait(timeout=timeout)
-            else:
-                raise ValueError(f"Invalid selector_type: {selector_type}")
-
-            if el and el.exists:
-                info = el.info
-                return {
-                    "text": info.get("text", ""),
-                    "resourceId": info.get("resourceId", ""),
-                    "description": info.get("contentDescription", ""),
-                    "className": info.get("className", ""),
-                    "enabled": info.get("enabled", False),
-                    "clickable": info.get("clickable", False),
-                    "bounds": info.get("bounds", {}),
-                    "selected": info.get("selected", False),
-                    "focused": info.get("focused", False),
-                }
-            return {}
+            return with_device(device_id, _element_info)
         except Exception as e:
-            print(f"Failed to get element info for {selector}: {str(e)}")
+            log.warning("Failed to get element info for %s: %s", selector, e)
             return {}
 
     @mcp.tool(
@@ -116,18 +400,15 @@ def register_inspection_tools(mcp):
             or network-dependent elements that may take time to appear.
         """
         try:
-            d = u2.connect(device_id)
-            if selector_type == "text":
-                return d(text=selector).wait(timeout=timeout)
-            elif selector_type == "resourceId":
-                return d(resourceId=selector).wait(timeout=timeout)
-            elif selector_type == "description":
-                el = d(description=selector).wait(timeout=timeout)
-                return el is not None and el.exists
-            else:
-                raise ValueError(f"Invalid selector_type: {selector_type}")
+            return with_device(
+                device_id,
+                lambda d: (
+                    cached_element(d, selector, selector_type) is not None
+                    or find(d, selector, selector_type).wait(timeout=timeout)
+                ),
+            )
         except Exception as e:
-            print(f"Failed to wait for element {selector}: {str(e)}")
+            log.warning("Failed to wait for element %s: %s", selector, e)
             return False
 
     @mcp.tool(
@@ -161,25 +442,25 @@ def register_inspection_tools(mcp):
             non-scrollable area or requires specific scroll directions.
         """
         try:
-            d = u2.connect(device_id)
-            if selector_type == "text":
-                return d(scrollable=True).scroll.to(text=selector)
-            elif selector_type == "resourceId":
-                return d(scrollable=True).scroll.to(resourceId=selector)
-            elif selector_type == "description":
-                el = d(scrollable=True).scroll.to(description=selector)
-                return el is not None and el.exists
-            else:
-                raise ValueError(f"Invalid selector_type: {selector_type}")
+            kwargs = selector_kwargs(selector, selector_type)
+            return with_device(
+                device_id, lambda d: d(scrollable=True).scroll.to(**kwargs)
+            )
         except Exception as e:
-            print(f"Failed to scroll to element {selector}: {str(e)}")
+            log.warning("Failed to scroll to element %s: %s", selector, e)
             return False
 
     @mcp.tool(
         name="screenshot",
         description="Capture a screenshot of the device screen and save it to the specified file path. Essential for debugging and visual verification.",
     )
-    def screenshot(filename: str, device_id: Optional[str] = None) -> bool:
+    def screenshot(
+        filename: str,
+        device_id: Optional[str] = None,
+        skip_unchanged: bool = False,
+        quality: int = 80,
+        scale: float = 1.0,
+    ) -> Union[bool, str]:
         """Take a screenshot of the device screen and save it to a file.
 
         This function captures the current screen state and saves it as an image file,
@@ -188,25 +469,36 @@ def register_inspection_tools(mcp):
         Args:
             filename: The file path where the screenshot will be saved (e.g., "screenshot.png")
             device_id: Optional device identifier. If not provided, uses the first available device
+            skip_unchanged: If the screen is identical to the last PNG/JPEG screenshot
+                saved from this device, do not write the file and return "unchanged"
+                (default: False)
+            quality: JPEG quality from 1 to 100 (default: 80)
+            scale: Downscale factor in (0, 1], e.g. 0.5 for half resolution.
+                JPEG screenshots are scaled on the device before transfer
+                (default: 1.0)
 
         Returns:
-            bool: True if the screenshot was saved successfully, False otherwise
+            bool: True if the screenshot was saved successfully, False otherwise.
+                  "unchanged" if skip_unchanged is set and nothing was written.
 
         Examples:
             >>> screenshot("login_screen.png")  # Save as PNG
             >>> screenshot("/path/to/screenshots/error.png")  # Save with full path
             >>> screenshot(f"test_{timestamp}.jpg")  # Dynamic filename
+            >>> screenshot("screen.jpg", quality=60, scale=0.5)  # Small image for a vision model
 
         Note:
             Supported formats include PNG, JPG, and other common image formats.
             The directory must exist and be writable.
         """
         try:
-            d = u2.connect(device_id)
-            d.screenshot(filename)
-            return True
+            written = with_device(
+                device_id,
+                lambda d: _save_screenshot(d, filename, skip_unchanged, quality, scale),
+            )
+            return True if written else "unchanged"
         except Exception as e:
-            print(f"Failed to take screenshot: {str(e)}")
+            log.warning("Failed to take screenshot: %s", e)
             return False
 
     @mcp.tool(
@@ -214,10 +506,13 @@ def register_inspection_tools(mcp):
         description="Dump the complete UI hierarchy of the current screen as XML. Essential for understanding screen structure, finding elements, and debugging automation issues.",
     )
     def dump_hierarchy(
-        compressed: bool = False,
-        pretty: bool = True,
+        compressed: bool = True,
+        pretty: bool = False,
         max_depth: int = 50,
+        filter_class: Optional[str] = None,
+        xpath: Optional[str] = None,
         device_id: Optional[str] = None,
+        to_file: Optional[str] = None,
     ) -> str:
         """Export the current screen's UI hierarchy as XML.
 
@@ -229,29 +524,190 @@ def register_inspection_tools(mcp):
         - Analyzing app UI changes
 
         Args:
-            compressed: If True, excludes less important nodes for smaller output (default: False)
-            pretty: If True, formats the XML with proper indentation (default: True)
+            compressed: If True, excludes less important nodes for smaller output (default: True)
+            pretty: If True, formats the XML with proper indentation (default: False)
             max_depth: Maximum depth of XML hierarchy to include (default: 50)
+            filter_class: Only return the subtrees of nodes with this class
+                (e.g. "android.widget.Button"). If not provided, returns everything
+            xpath: Only return the nodes selected by this XPath expression,
+                with their subtrees (e.g. "//node[@clickable='true']")
             device_id: Optional device identifier. If not provided, uses the first available device
+            to_file: Write the XML to this file path instead of returning it
 
         Returns:
-            str: XML string representing the complete UI hierarchy
+            str: XML string representing the complete UI hierarchy, or a short
+                 confirmation naming the file when to_file is given
 
         Examples:
-            >>> dump_hierarchy()  # Full pretty-formatted hierarchy
-            >>> dump_hierarchy(compressed=True)  # Smaller output for debugging
+            >>> dump_hierarchy()  # Compressed hierarchy
+            >>> dump_hierarchy(compressed=False, pretty=True)  # Every node, indented
             >>> dump_hierarchy(max_depth=10)  # Limited depth for faster processing
+            >>> dump_hierarchy(filter_class="android.widget.EditText")  # Input fields only
+            >>> dump_hierarchy(xpath="//node[@resource-id='com.app:id/list']")  # One subtree
+            >>> dump_hierarchy(to_file="/tmp/screen.xml")  # Keep the XML out of the response
 
         Note:
-            The output can be very large for complex screens. Use compressed=True
-            for quicker analysis when you don't need all details.
+            The output can be very large for complex screens. Pass
+            compressed=False only when you need the nodes it leaves out.
         """
         try:
-            d = u2.connect(device_id)
-            xml = d.dump_hierarchy(
-                compressed=compressed, pretty=pretty, max_depth=max_depth
+            xml = with_device(
+                device_id,
+                lambda d: d.dump_hierarchy(
+                    compressed=compressed,
+                    pretty=pretty and not (filter_class or xpath),
+                    max_depth=max_depth,
+                ),
             )
+            if filter_class:
+                xml = _filter_hierarchy(xml, filter_class, pretty and not xpath)
+            if xpath:
+                xml = _xpath_hierarchy(xml, xpath, pretty)
+            if to_file:
+                with open(to_file, "w", encoding="utf-8") as f:
+                    f.write(xml)
+                return f"Wrote {len(xml)} characters to {to_file}"
             return xml
         except Exception as e:
-            print(f"Failed to dump UI hierarchy: {str(e)}")
+            log.warning("Failed to dump UI hierarchy: %s", e)
             return ""
+
+    @mcp.tool(
+        name="dump_hierarchy_compact",
+        description="Dump the UI hierarchy of the current screen in a compact column-oriented JSON form. Much smaller than the XML from dump_hierarchy; prefer it when you only need element classes, IDs, text and bounds.",
+    )
+    def dump_hierarchy_compact(
+        compressed: bool = False,
+        max_depth: int = 50,
+        device_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Export the current screen's UI hierarchy as compact column arrays.
+
+        Every node is described by its position in parallel lists. Class names
+        and resource IDs are stored once in lookup tables and referenced by index.
+
+        Args:
+            compressed: If True, excludes less important nodes for smaller output (default: False)
+            max_depth: Maximum depth of XML hierarchy to include (default: 50)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            Dictionary containing:
+                - classes: Unique class names
+                - resource_ids: Unique resource IDs
+                - class_idx: Index into classes for each node
+                - resource_id_idx: Index into resource_ids for each node (-1 if none)
+                - parent: Index of each node's parent node (-1 for top-level nodes)
+                - text: Visible text of each node
+                - description: Content description of each node
+                - clickable: Whether each node is clickable
+                - bounds: Flattened [left, top, right, bottom] values, four per node
+
+            Returns empty dictionary if the hierarchy could not be dumped.
+
+        Examples:
+            >>> dump_hierarchy_compact()  # Compact form of the full hierarchy
+            >>> dump_hierarchy_compact(compressed=True)  # Skip less important nodes
+        """
+        try:
+            xml = with_device(
+                device_id,
+                lambda d: d.dump_hierarchy(compressed=compressed, max_depth=max_depth),
+            )
+            return _compact_hierarchy(xml)
+        except Exception as e:
+            log.warning("Failed to dump compact UI hierarchy: %s", e)
+            return {}
+
+    @mcp.tool(
+        name="build_ui_snapshot",
+        description="Observe the screen in one request: UI hierarchy XML, the focused element and optionally a JPEG screenshot, fetched from the device in a single batch. Use after an action instead of calling dump_hierarchy, get_element_info and screenshot separately.",
+    )
+    def build_ui_snapshot(
+        include_xml: bool = True,
+        include_focused: bool = True,
+        screenshot_file: Optional[str] = None,
+        compressed: bool = True,
+        max_depth: int = 50,
+        device_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Capture the current screen state in a single device round-trip.
+
+        Args:
+            include_xml: Include the UI hierarchy XML (default: True)
+            include_focused: Include the element that has input focus (default: True)
+            screenshot_file: Save a JPEG screenshot to this file path. If not
+                provided, no screenshot is taken
+            compressed: If True, excludes less important hierarchy nodes (default: True)
+            max_depth: Maximum depth of XML hierarchy to include (default: 50)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            Dictionary containing:
+                - hierarchy: XML string (None if not requested or failed)
+                - focused: Focused element properties as in get_element_info
+                  (None if not requested or nothing is focused)
+                - screenshot: Path of the saved screenshot (None if not
+                  requested or failed)
+
+            Returns empty dictionary if the device could not be reached.
+
+        Examples:
+            >>> build_ui_snapshot()  # Hierarchy and focused element
+            >>> build_ui_snapshot(include_xml=False, screenshot_file="step3.jpg")
+        """
+        try:
+            return with_device(
+                device_id,
+                lambda d: _ui_snapshot(
+                    d,
+                    include_xml,
+                    include_focused,
+                    screenshot_file,
+                    compressed,
+                    max_depth,
+                ),
+            )
+        except Exception as e:
+            log.warning("Failed to build UI snapshot: %s", e)
+            return {}
+
+    @mcp.tool(
+        name="find_elements_xpath",
+        description="Look up several UI elements at once with XPath expressions over a single hierarchy dump, e.g. [\"//node[@clickable='true']\", \"//node[@resource-id='com.app:id/title']\"]. Returns the attributes of every match. Faster than one get_element_info call per element.",
+    )
+    def find_elements_xpath(
+        xpaths: List[str],
+        compressed: bool = True,
+        device_id: Optional[str] = None,
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """Find the elements matching each XPath expression on the current screen.
+
+        The hierarchy is dumped and parsed once, and every expression is
+        evaluated against the same tree.
+
+        Args:
+            xpaths: XPath expressions over the dump_hierarchy XML
+                (e.g. "//node[@class='android.widget.Button']")
+            compressed: If True, excludes less important nodes (default: True)
+            device_id: Optional device identifier. If not provided, uses the first available device
+
+        Returns:
+            Dictionary mapping each expression to a list of matched elements,
+            each given by its XML attributes (text, resource-id, class,
+            content-desc, bounds, clickable, ...).
+
+            Returns empty dictionary if the hierarchy could not be dumped or
+            an expression is invalid.
+
+        Examples:
+            >>> find_elements_xpath(["//node[@text='OK']", "//node[@class='android.widget.EditText']"])
+        """
+        try:
+            xml = with_device(
+                device_id, lambda d: d.dump_hierarchy(compressed=compressed)
+            )
+            return _find_xpaths(xml, xpaths)
+        except Exception as e:
+            log.warning("Failed to find elements by XPath: %s", e)
+            return {}
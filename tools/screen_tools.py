@@ -1,6 +1,25 @@
-import uiautomator2 as u2
-from typing import Optional
 import asyncio
+import time
+from typing import Dict
+
+from ._device import device_action, device_info, with_device
+from ._registry import offload
+
+# Seconds after a successful unlock_screen during which another call is a no-op
+UNLOCK_TTL = 0.5
+
+# serial -> monotonic time of the last successful unlock_screen
+_unlocked_at: Dict[str, float] = {}
+
+
+def _screen_is_on(device_id=None) -> bool:
+    """Read the screen state from a fresh ``d.info`` (blocking).
+
+    ``d.screen_on()`` is not a query: it wakes the screen and returns None.
+    """
+    return with_device(
+        device_id, lambda d: bool(device_info(d, max_age=0).get("screenOn", False))
+    )
 
 
 def register_screen_tools(mcp):
@@ -10,7 +29,8 @@ def register_screen_tools(mcp):
         name="screen_on",
         description="Turn the device screen on. Useful when the device has gone to sleep during automated testing.",
     )
-    def screen_on(device_id: Optional[str] = None) -> bool:
+    @device_action
+    def screen_on(d) -> bool:
         """Turn on the device screen if it is currently off.
 
         This function wakes up the device and turns on the display,
@@ -22,19 +42,14 @@ def register_screen_tools(mcp):
         Returns:
             bool: True if the screen was turned on successfully, False otherwise
         """
-        try:
-            d = u2.connect(device_id)
-            d.screen_on()
-            return True
-        except Exception as e:
-            print(f"Failed to turn screen on: {str(e)}")
-            return False
+        d.screen_on()
 
     @mcp.tool(
         name="screen_off",
         description="Turn the device screen off. Useful for testing how apps behave when device goes to sleep.",
     )
-    def screen_off(device_id: Optional[str] = None) -> bool:
+    @device_action
+    def screen_off(d) -> bool:
         """Turn off the device screen.
 
         This function turns off the device display, putting it in sleep mode.
@@ -45,19 +60,15 @@ def register_screen_tools(mcp):
         Returns:
             bool: True if the screen was turned off successfully, False otherwise
         """
-        try:
-            d = u2.connect(device_id)
-            d.screen_off()
-            return True
-        except Exception as e:
-            print(f"Failed to turn screen off: {str(e)}")
-            return False
+        _unlocked_at.pop(d.serial, None)
+        d.screen_off()
 
     @mcp.tool(
         name="unlock_screen",
         description="Unlock the device screen. This will wake the device if it's asleep and attempt to unlock it using the default method (swipe up or press home button).",
     )
-    def unlock_screen(device_id: Optional[str] = None) -> bool:
+    @device_action
+    def unlock_screen(d) -> bool:
         """Unlock the device screen if it is locked.
 
         This function will turn on the screen if it's off and attempt to unlock
@@ -71,23 +82,24 @@ def register_screen_tools(mcp):
 
         Note:
             This may not work with complex security methods like PIN, pattern,
-            password, or biometric authentication.
+            password, or biometric authentication. Repeated calls within
+            half a second of a successful unlock return at once.
         """
-        try:
-            d = u2.connect(device_id)
-            if not d.info["screenOn"]:
-                d.screen_on()
-            d.unlock()
-            return True
-        except Exception as e:
-            print(f"Failed to unlock screen: {str(e)}")
-            return False
+        unlocked_at = _unlocked_at.get(d.serial)
+        if unlocked_at is not None and time.monotonic() - unlocked_at < UNLOCK_TTL:
+            return
+        if not device_info(d)["screenOn"]:
+            d.screen_on()
+            # Same swipe as d.unlock(), without it fetching d.info again
+            # (which would now report the screen as on and skip the swipe)
+            d.swipe(0.1, 0.9, 0.9, 0.1)
+        _unlocked_at[d.serial] = time.monotonic()
 
     @mcp.tool(
         name="wait_for_screen_on",
         description="Wait until the device screen is turned on. Useful for asynchronous operations where screen activation is expected.",
     )
-    async def wait_for_screen_on(device_id: str) -> str:
+    async def wait_for_screen_on(device_id: str, timeout: float = 30.0) -> str:
         """Asynchronously wait for the device screen to turn on.
 
         This function polls the device screen state and returns when the screen
@@ -96,15 +108,24 @@ def register_screen_tools(mcp):
 
         Args:
             device_id: The device identifier to connect to
+            timeout: Maximum seconds to wait (default: 30.0)
 
         Returns:
-            str: Message confirming that the screen is now on
+            str: Message confirming that the screen is now on, or that the wait timed out
 
         Note:
-            This is an async function that checks every second for the screen to turn on.
-            It may wait indefinitely if the screen never turns on.
+            Polling starts at 50ms and backs off exponentially to once per second,
+            so fast wake-ups are noticed quickly without flooding the device.
         """
-        d = u2.connect(device_id)
-        while not d.screen_on():
-            await asyncio.sleep(1)
+
+        async def poll():
+            delay = 0.05
+            while not await offload(_screen_is_on)(device_id=device_id):
+                await asyncio.sleep(delay)
+                delay = min(1.0, delay * 2)
+
+        try:
+            await asyncio.wait_for(poll(), timeout=timeout)
+        except TimeoutError:
+            return f"Timed out after {timeout}s waiting for screen to turn on"
         return "Screen is now on"